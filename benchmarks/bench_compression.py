@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""
+    Compares the plain JSON snapshot with the compressed ones: time to
+    save, time to reload and size on disk.
+
+    Usage: ./benchmarks/bench_compression.py [number of objects]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+os.chdir(tempfile.mkdtemp())
+
+from models.engine.file_storage import FileStorage  # noqa: E402
+from models.city import City  # noqa: E402
+from models.place import Place  # noqa: E402
+from models.review import Review  # noqa: E402
+from models.user import User  # noqa: E402
+
+CODECS = [
+    (None, None),
+    ("zlib", 1), ("zlib", 6),
+    ("gzip", 1), ("gzip", 9),
+    ("lzma", 0), ("lzma", 6),
+]
+
+
+def populate(count):
+    """creates count objects spread over a few classes"""
+    for i in range(count // 4):
+        user = User()
+        user.email = "user{}@mail.com".format(i)
+        user.first_name = "Betty"
+        city = City()
+        city.state_id = user.id
+        city.name = "City {}".format(i % 500)
+        place = Place()
+        place.city_id = city.id
+        place.user_id = user.id
+        place.name = "Place {}".format(i)
+        place.number_rooms = i % 6
+        place.price_by_night = 50 + i % 300
+        place.latitude = 37.77 + i * 1e-5
+        place.longitude = -122.41 - i * 1e-5
+        review = Review()
+        review.place_id = place.id
+        review.user_id = user.id
+        review.text = "Great place, would stay again"
+
+
+def main():
+    """runs the benchmark"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    populate(count)
+    FileStorage().save()
+    print("{} objects".format(count))
+    print("{:<10}{:>12}{:>12}{:>14}{:>8}".format(
+        "codec", "save (s)", "reload (s)", "bytes", "ratio"))
+    plain = None
+    for codec, level in CODECS:
+        storage = FileStorage(compression=codec, compression_level=level)
+        start = time.perf_counter()
+        storage.save()
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        storage.reload()
+        reloaded = time.perf_counter() - start
+        size = os.path.getsize("file.json")
+        plain = plain or size
+        name = "json" if codec is None else "{}-{}".format(codec, level)
+        print("{:<10}{:>12.3f}{:>12.3f}{:>14}{:>8.2f}".format(
+            name, saved, reloaded, size, plain / size))
+
+
+if __name__ == "__main__":
+    main()
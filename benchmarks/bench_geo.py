@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""
+    Cost of the Place geographic searches with the grid index, against
+    measuring the distance to every place.
+
+    Usage: ./benchmarks/bench_geo.py [number of places]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from models.engine.indexes import GeoIndex, _distance  # noqa: E402
+
+
+def timed(func, *args):
+    """Returns the result of func(*args) and its time in milliseconds"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1e3
+
+
+def scan_near(positions, lat, lon, km):
+    """near() without an index"""
+    found = []
+    for key, pos in positions.items():
+        dist = _distance(lat, lon, *pos)
+        if dist <= km:
+            found.append((dist, key))
+    found.sort()
+    return found
+
+
+def scan_nearest(positions, lat, lon, k):
+    """nearest() without an index"""
+    return sorted((_distance(lat, lon, *pos), key)
+                  for key, pos in positions.items())[:k]
+
+
+def main():
+    """runs the benchmark"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rnd = random.Random(0)
+    # half the places in a few dense metro areas, half anywhere
+    metros = [(rnd.uniform(-60, 60), rnd.uniform(-180, 180))
+              for i in range(50)]
+    positions = {}
+    for i in range(count):
+        if i % 2:
+            lat, lon = rnd.choice(metros)
+            pos = (min(max(rnd.gauss(lat, 0.3), -90), 90),
+                   min(max(rnd.gauss(lon, 0.3), -180), 180))
+        else:
+            pos = (rnd.uniform(-90, 90), rnd.uniform(-180, 180))
+        positions["Place.{}".format(i)] = pos
+    index = GeoIndex(("latitude", "longitude"))
+    start = time.perf_counter()
+    for key, pos in positions.items():
+        index.add(pos, key)
+    print("{} places, index built in {:.2f} s".format(
+        count, time.perf_counter() - start))
+    queries = [rnd.choice(metros) for i in range(20)]
+    rows = [
+        ("near 5 km", index.near, scan_near, 5),
+        ("near 50 km", index.near, scan_near, 50),
+        ("nearest 10", index.nearest, scan_nearest, 10),
+    ]
+    print("{:<14}{:>12}{:>12}{:>10}".format(
+        "milliseconds", "indexed", "scan", "results"))
+    for name, indexed, scan, arg in rows:
+        index_ms = scan_ms = found = 0
+        for lat, lon in queries:
+            result, ms = timed(indexed, lat, lon, arg)
+            index_ms += ms
+            found += len(result)
+        for lat, lon in queries[:3]:
+            expected, ms = timed(scan, positions, lat, lon, arg)
+            scan_ms += ms
+            assert expected == timed(indexed, lat, lon, arg)[0]
+        print("{:<14}{:>12.3f}{:>12.1f}{:>10}".format(
+            name, index_ms / len(queries), scan_ms / 3,
+            found // len(queries)))
+
+
+if __name__ == "__main__":
+    main()
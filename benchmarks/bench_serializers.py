@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""
+    Compares the snapshot serializers: records encoded and decoded per
+    second, time to save and reload the whole snapshot, and its size,
+    with ISO 8601 then with epoch timestamps.
+
+    Usage: ./benchmarks/bench_serializers.py [number of objects]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+os.chdir(tempfile.mkdtemp())
+
+from models.engine.file_storage import FileStorage  # noqa: E402
+from models.engine.serializers import SERIALIZERS  # noqa: E402
+from models.city import City  # noqa: E402
+from models.place import Place  # noqa: E402
+from models.review import Review  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+def populate(count):
+    """creates count objects spread over a few classes"""
+    for i in range(count // 4):
+        user = User()
+        user.email = "user{}@mail.com".format(i)
+        user.first_name = "Betty"
+        city = City()
+        city.state_id = user.id
+        city.name = "City {}".format(i % 500)
+        place = Place()
+        place.city_id = city.id
+        place.user_id = user.id
+        place.name = "Place {}".format(i)
+        place.number_rooms = i % 6
+        place.price_by_night = 50 + i % 300
+        place.latitude = 37.77 + i * 1e-5
+        place.longitude = -122.41 - i * 1e-5
+        review = Review()
+        review.place_id = place.id
+        review.user_id = user.id
+        review.text = "Great place, would stay again"
+
+
+def timed(func, *args):
+    """Returns the result of func(*args) and its time in seconds"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    """runs the benchmark"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    populate(count)
+    objs = list(FileStorage().all().values())
+    encoded = FileStorage._FileStorage__encoded
+    print("{} objects".format(count))
+    print("{:<15}{:>13}{:>13}{:>11}{:>12}{:>14}".format(
+        "format", "encode/s", "decode/s", "save (s)", "reload (s)",
+        "bytes"))
+    for epoch in (False, True):
+        for name, serializer in SERIALIZERS.items():
+            blobs, encoding = timed(lambda: [
+                serializer.encode_object(obj, epoch) for obj in objs])
+            decoding = timed(
+                lambda: [serializer.decode(blob) for blob in blobs])[1]
+            storage = FileStorage(serializer=name, epoch_timestamps=epoch)
+            encoded.clear()
+            saved = timed(storage.save)[1]
+            reloaded = timed(storage.reload)[1]
+            print("{:<15}{:>13,.0f}{:>13,.0f}{:>11.2f}{:>12.2f}{:>14,}".format(
+                name + (" epoch" if epoch else ""), len(objs) / encoding,
+                len(objs) / decoding, saved, reloaded,
+                os.path.getsize("file.json")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+"""
+    Per-object cost of the BaseModel timestamp codecs: decoding the two
+    stored timestamps when an instance is rebuilt and encoding them when
+    it is saved.
+
+    Usage: ./benchmarks/bench_timestamps.py [number of objects]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+os.chdir(tempfile.mkdtemp())
+
+from models.base_model import BaseModel, decode_time  # noqa: E402
+from models.base_model import EPOCH, MICROSECOND  # noqa: E402
+
+
+def per_object(count, func):
+    """Returns the mean time in microseconds of func() over count calls"""
+    start = time.perf_counter()
+    for i in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    """runs the benchmark"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    now = datetime.now()
+    iso = now.isoformat()
+    epoch = (now - EPOCH) // MICROSECOND
+    fmt = "%Y-%m-%dT%H:%M:%S.%f"
+    model = BaseModel(id="1", created_at=iso, updated_at=iso)
+    iso_record = model.to_dict()
+    epoch_record = model.to_dict(epoch=True)
+    rows = [
+        ("decode strptime (before)",
+         lambda: (datetime.strptime(iso, fmt), datetime.strptime(iso, fmt))),
+        ("decode fromisoformat",
+         lambda: (decode_time(iso), decode_time(iso))),
+        ("decode epoch",
+         lambda: (decode_time(epoch), decode_time(epoch))),
+        ("encode isoformat",
+         lambda: (now.isoformat(), now.isoformat())),
+        ("encode epoch",
+         lambda: ((now - EPOCH) // MICROSECOND,
+                  (now - EPOCH) // MICROSECOND)),
+        ("BaseModel(**iso record)",
+         lambda: BaseModel(**iso_record)),
+        ("BaseModel(**epoch record)",
+         lambda: BaseModel(**epoch_record)),
+        ("to_dict()",
+         lambda: model.to_dict()),
+        ("to_dict(epoch=True)",
+         lambda: model.to_dict(epoch=True)),
+    ]
+    print("{} iterations, microseconds per object".format(count))
+    for name, func in rows:
+        print("{:<28}{:>8.3f}".format(name, per_object(count, func)))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,7 @@
 import cmd
 import ast
 from models import storage
-from models.base_model import BaseModel
-from models.user import User
-from models.state import State
-from models.city import City
-from models.amenity import Amenity
-from models.place import Place
-from models.review import Review
+from models.base_model import registry
 
 
 class HBNBCommand(cmd.Cmd):
@@ -21,15 +15,7 @@ class HBNBCommand(cmd.Cmd):
 
     prompt = '(hbnb) '
 
-    valid_classes = [
-        "BaseModel",
-        "User",
-        "State",
-        "City",
-        "Amenity",
-        "Place",
-        "Review",
-    ]
+    valid_classes = registry
 
     def do_create(self, line):
         """Usage: create <classname>"""
@@ -38,8 +24,7 @@ class HBNBCommand(cmd.Cmd):
                 print("** class doesn't exist **")
                 return
 
-            cls = eval(line.strip())
-            model = cls()
+            model = registry[line]()
             print(model.id)
             model.save()
         else:
@@ -54,9 +39,7 @@ class HBNBCommand(cmd.Cmd):
             elif len(args) < 2:
                 print("** instance id missing **")
             else:
-                allobjects = storage.all()
-                key = args[0] + "." + args[1]
-                found = allobjects.get(key, None)
+                found = storage.get(args[0], args[1])
                 if found:
                     print(found)
                 else:
@@ -73,11 +56,9 @@ class HBNBCommand(cmd.Cmd):
             elif len(args) < 2:
                 print("** instance id missing **")
             else:
-                allobjects = storage.all()
-                key = args[0] + "." + args[1]
-                found = allobjects.get(key, None)
+                found = storage.get(args[0], args[1])
                 if found:
-                    deleted = allobjects.pop(key)
+                    storage.delete(found)
                     storage.save()
                 else:
                     print("** no instance found **")
@@ -86,21 +67,35 @@ class HBNBCommand(cmd.Cmd):
 
     def do_all(self, line):
         """Usage: all or all <classname>"""
-        allobjs = storage.all()
         if line:
             args = line.split()
             if args[0] in HBNBCommand.valid_classes:
-                classlist = [
-                    str(val) for key, val in allobjs.items()
-                    if key.startswith(args[0])
-                ]
+                with storage.snapshot() as snap:
+                    classlist = [
+                        str(val) for val in snap.all(args[0]).values()
+                    ]
                 print(classlist)
             else:
                 print("** class doesn't exist **")
         else:
-            allclass = [str(val) for val in allobjs.values()]
+            with storage.snapshot() as snap:
+                allclass = [str(val) for val in snap.all().values()]
             print(allclass)
 
+    def do_search(self, line):
+        """Usage: search <classname> <words>"""
+        if line:
+            args = line.split(None, 1)
+            if args[0] not in HBNBCommand.valid_classes:
+                print("** class doesn't exist **")
+            elif len(args) < 2 or not args[1].strip(' "'):
+                print("** search words missing **")
+            else:
+                found = storage.search(args[0], args[1])
+                print([str(obj) for score, obj in found])
+        else:
+            print("** class name missing **")
+
     def do_update(self, line):
         """ Usage: update <classname> <id> <attribute-name> <"value">"""
         if line:
@@ -110,14 +105,14 @@ class HBNBCommand(cmd.Cmd):
             elif len(args) < 2:
                 print("** instance id missing **")
             else:
-                allobjects = storage.all()
-                key = args[0] + "." + args[1]
-                found = allobjects.get(key, None)
+                found = storage.get(args[0], args[1])
                 if found:
                     if len(args) < 3:
                         print("** attribute name missing **")
                     elif len(args) < 4:
                         print("** value missing **")
+                    elif self._read_only(found, args[2]):
+                        print("** attribute can't be set **")
                     else:
                         try:
                             setattr(
@@ -141,24 +136,31 @@ class HBNBCommand(cmd.Cmd):
             if type(new_dict) is not dict:
                 print("** Invalid dictionary **")
                 return
-            key_id = "{}.{}".format(classname, args[0].strip('"').strip())
-            obj = storage.all().get(key_id, None)
+            obj = storage.get(classname, args[0].strip('"').strip())
 
             if obj is None:
                 print("** no instance found **")
                 return
 
+            if any(self._read_only(obj, key) for key in new_dict):
+                print("** attribute can't be set **")
+                return
+
             for key in new_dict:
                 setattr(obj, key, new_dict[key])
         except BaseException:
             print("** Invalid dictionary **")
 
+    @staticmethod
+    def _read_only(obj, name):
+        """Returns True if name is a property of obj without a setter"""
+        attr = getattr(type(obj), name, None)
+        return isinstance(attr, property) and attr.fset is None
+
     def _do_count(self, line):
         """Usage: <classname>.count()"""
         model_name = line.split()[0]
-        keys = [key for key in storage.all().keys()
-                if key.startswith(model_name)]
-        print(len(keys))
+        print(storage.count(model_name))
 
     def default(self, line):
         """Executes all other commands"""
@@ -167,7 +169,8 @@ class HBNBCommand(cmd.Cmd):
             'all': self.do_all,
             'show': self.do_show,
             'update': self.do_update,
-            'destroy': self.do_destroy
+            'destroy': self.do_destroy,
+            'search': self.do_search
         }
         commands = line.split('.', 1)
 
@@ -204,8 +207,8 @@ class HBNBCommand(cmd.Cmd):
             new_attrs = args.split(',', 1)
 
             if len(new_attrs) < 2:
-                key_id = f'{commands[0].strip()}.{new_attrs[0].strip()}'
-                found = storage.all().get(key_id, None)
+                found = storage.get(commands[0].strip(),
+                                    new_attrs[0].strip())
                 if found:
                     print("** attribute name missing **")
                 else:
@@ -225,13 +228,20 @@ class HBNBCommand(cmd.Cmd):
 
     def do_quit(self, arg):
         """Quit command to exit the program\n"""
+        storage.flush()
         return True
 
     def do_EOF(self, arg):
         """quits the command interpreter"""
         print
+        storage.flush()
         return True
 
+    def precmd(self, line):
+        """reads in what other processes saved before every command"""
+        storage.refresh()
+        return line
+
     def emptyline(self):
         """does nothing when there's no command"""
         pass
@@ -1,8 +1,61 @@
 #!/usr/bin/python3
 """
     Task 5: the module contains a storage variable of type FileStorage
+
+    Set HBNB_TYPE_STORAGE=db to use the SQLite engine instead (database
+    file taken from HBNB_SQLITE_DB, hbnb.db by default).
+
+    Set HBNB_FILE_JOURNAL=1 to persist mutations to an append-only log
+    instead of rewriting file.json on every save, and HBNB_FILE_LAZY=1 to
+    build the stored instances on first access instead of at startup.
+    HBNB_FILE_SHARDS=1 writes one snapshot file per class and a larger
+    number splits every class into that many files.
+    HBNB_FILE_FSYNC=1 fsyncs every write and HBNB_FILE_GROUP_COMMIT_MS
+    coalesces the saves arriving within that many milliseconds.
+    HBNB_FILE_WRITE_BEHIND=<seconds> hands the writes to a background
+    thread, flushed earlier once HBNB_FILE_FLUSH_THRESHOLD changes wait.
+    HBNB_FILE_COMPRESSION=gzip|zlib|lzma compresses the snapshot, at
+    HBNB_FILE_COMPRESSION_LEVEL if set. HBNB_FILE_EPOCH_TIMESTAMPS=1
+    stores the timestamps as integer microseconds. HBNB_FILE_COLUMNAR=1
+    keeps the attributes of the loaded instances in column stores.
+    HBNB_FILE_SHARED=1 lets several processes share the files safely.
+    HBNB_FILE_COMPACT_BYTES and HBNB_FILE_COMPACT_RATIO set the journal
+    log size, in bytes or relative to the snapshot, starting a compaction.
+    HBNB_FILE_THREADSAFE=1 guards the objects with a reader/writer lock so
+    threads can share the storage. HBNB_FILE_SERIALIZER=marshal|binary
+    writes the snapshot in that format instead of JSON.
 """
-from models.engine.file_storage import FileStorage
+from os import getenv
+from models.base_model import BaseModel
+from models.user import User
+from models.state import State
+from models.city import City
+from models.amenity import Amenity
+from models.place import Place
+from models.review import Review
 
-storage = FileStorage()
+if getenv("HBNB_TYPE_STORAGE") == "db":
+    from models.engine.db_storage import DBStorage
+    storage = DBStorage()
+else:
+    from models.engine.file_storage import FileStorage
+    storage = FileStorage(
+        journal=getenv("HBNB_FILE_JOURNAL") == "1",
+        lazy=getenv("HBNB_FILE_LAZY") == "1",
+        shards=int(getenv("HBNB_FILE_SHARDS", "0")),
+        fsync=getenv("HBNB_FILE_FSYNC") == "1",
+        group_commit=int(getenv("HBNB_FILE_GROUP_COMMIT_MS", "0")),
+        write_behind=float(getenv("HBNB_FILE_WRITE_BEHIND", "0")),
+        flush_threshold=int(getenv("HBNB_FILE_FLUSH_THRESHOLD", "0")),
+        compression=getenv("HBNB_FILE_COMPRESSION") or None,
+        compression_level=(int(getenv("HBNB_FILE_COMPRESSION_LEVEL"))
+                           if getenv("HBNB_FILE_COMPRESSION_LEVEL") else None),
+        epoch_timestamps=getenv("HBNB_FILE_EPOCH_TIMESTAMPS") == "1",
+        columnar=getenv("HBNB_FILE_COLUMNAR") == "1",
+        shared=getenv("HBNB_FILE_SHARED") == "1",
+        compact_bytes=int(getenv("HBNB_FILE_COMPACT_BYTES", "0")),
+        compact_ratio=float(getenv("HBNB_FILE_COMPACT_RATIO", "0")),
+        threadsafe=getenv("HBNB_FILE_THREADSAFE") == "1",
+        serializer=getenv("HBNB_FILE_SERIALIZER") or "json",
+    )
 storage.reload()
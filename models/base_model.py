@@ -1,12 +1,30 @@
 #!/usr/bin/python3
 """
     TASK 3: base_model module
-    The module defines the BaseModel class
+    The module defines the BaseModel class and the registry mapping the
+    name of every model class to the class
 """
 import uuid
-from datetime import datetime
+import weakref
+from datetime import datetime, timedelta
 import models
 
+registry = {}
+_memos = weakref.WeakKeyDictionary()
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def decode_time(val):
+    """
+    Returns the datetime of a stored timestamp, either an ISO 8601 string
+    or an integer count of microseconds since EPOCH
+    """
+    if type(val) is int:
+        return EPOCH + val * MICROSECOND
+    return datetime.fromisoformat(val)
+
 
 class BaseModel:
     """
@@ -25,10 +43,9 @@ class BaseModel:
             instance of the BaseModel instead.
         """
         if kwargs and len(kwargs) > 0:
-            fmt = "%Y-%m-%dT%H:%M:%S.%f"
             for key, val in kwargs.items():
                 if key == "created_at" or key == "updated_at":
-                    kwargs[key] = datetime.strptime(val, fmt)
+                    kwargs[key] = decode_time(val)
                 self.__dict__[key] = kwargs[key]
         else:
             self.id = str(uuid.uuid4())
@@ -36,12 +53,27 @@ class BaseModel:
             self.updated_at = datetime.now()
             models.storage.new(self)
 
+    def __init_subclass__(cls, register=True, **kwargs):
+        """
+        registers every model class under its name, unless it is defined
+            with register=False
+        """
+        super().__init_subclass__(**kwargs)
+        if register:
+            registry[cls.__name__] = cls
+
+    def __setattr__(self, name, value):
+        """sets the attribute and flags the instance as changed in storage"""
+        with models.storage.writing:
+            models.storage.mark_dirty(self, name, value)
+            super().__setattr__(name, value)
+
     def __str__(self):
         """Task 3: overriding the toString method"""
         return "[{}] ({}) {}".format(
             self.__class__.__name__,
             self.id,
-            self.__dict__
+            self._attributes()
         )
 
     def save(self):
@@ -52,18 +84,56 @@ class BaseModel:
         self.updated_at = datetime.now()
         models.storage.save()
 
-    def to_dict(self):
+    def to_dict(self, *, epoch=False):
         """
         task 3: returns a dictionary containing all keys/values of __dict__
             of the current BaseModel instance
+            epoch: when True the timestamps are given as integer
+                microseconds since EPOCH instead of ISO 8601 strings
         """
         my_dict = {}
-        for key, val in self.__dict__.items():
+        for key, val in self._attributes().items():
             if key == "created_at" or key == "updated_at":
-                my_dict[key] = val.isoformat()
+                if epoch:
+                    my_dict[key] = (val - EPOCH) // MICROSECOND
+                else:
+                    my_dict[key] = val.isoformat()
             elif key == "number":
                 my_dict["my_number"] = val
             else:
                 my_dict[key] = val
         my_dict['__class__'] = self.__class__.__name__
         return my_dict
+
+    def _related(self, name, classnames, compute, *depends):
+        """
+        Returns the list of objects compute() gives, memoized on the
+            instance under name until storage reports a change to an
+            object of one of classnames or the values depends differ
+        """
+        stamp = (
+            tuple(models.storage.stamp(classname) for classname in classnames),
+            depends
+        )
+        memo = _memos.setdefault(self, {})
+        cached = memo.get(name)
+        if cached is None or cached[0] != stamp:
+            cached = memo[name] = (stamp, compute())
+        return list(cached[1])
+
+    def _attributes(self):
+        """Returns the dictionary of the instance attributes"""
+        return self.__dict__
+
+    def _set_attributes(self, attrs):
+        """replaces the instance attributes by attrs without tracking it"""
+        self.__dict__.clear()
+        self.__dict__.update(attrs)
+
+
+def by_creation(objs):
+    """Returns the list of objs, oldest first"""
+    return sorted(objs, key=lambda obj: (obj.created_at, obj.id))
+
+
+registry["BaseModel"] = BaseModel
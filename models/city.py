@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """The module contains the class City, a subclass of the BaseModel class"""
-from models.base_model import BaseModel
+import models
+from models.base_model import BaseModel, by_creation
 
 
 class City(BaseModel):
@@ -13,3 +14,11 @@ class City(BaseModel):
     """
     state_id = ''
     name = ''
+    _hash_indexes = ("state_id",)
+
+    @property
+    def places(self):
+        """Returns the list of the places of the city"""
+        return self._related("places", ("Place",), lambda: by_creation(
+            models.storage.find("Place", "city_id", self.id).values()),
+            self.id)
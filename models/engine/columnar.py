@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+"""
+    columnar module: keeps the attributes of model instances column by
+    column instead of in one dictionary per instance
+"""
+import sys
+from array import array
+from datetime import datetime
+from models.base_model import EPOCH, MICROSECOND, decode_time
+
+_MISSING = object()
+_TYPECODES = {int: "q", float: "d"}
+
+
+class ColumnStore:
+    """
+        The ColumnStore class holds the instances of one model class as
+        one column per attribute, each instance being a proxy of its row
+    """
+
+    def __init__(self, cls):
+        """cls: the model class whose instances are stored"""
+        self.cls = cls
+        self.defaults = {}
+        self.kinds = {"id": None, "created_at": "t", "updated_at": "t"}
+        for name in dir(cls):
+            val = getattr(cls, name)
+            if name.startswith("_") or type(val) not in (str, int, float,
+                                                         list):
+                continue
+            self.defaults[name] = val
+            self.kinds[name] = _TYPECODES.get(type(val))
+        self.names = list(self.kinds)
+        self.columns = {}
+        for name, kind in self.kinds.items():
+            if kind is None:
+                self.columns[name] = []
+            else:
+                self.columns[name] = array("q" if kind == "t" else kind)
+        self.flags = {name: bytearray() for name in self.names}
+        self.overflow = {name: {} for name in self.names}
+        self.rows = 0
+        self.extra_rows = set()
+        self.proxy = _proxy_class(self)
+
+    def add(self, attrs):
+        """Returns the proxy of a new row holding the attributes attrs"""
+        row = self.rows
+        self.rows += 1
+        for name in self.names:
+            kind = self.kinds[name]
+            self.columns[name].append(0 if kind else None)
+            self.flags[name].append(0)
+            val = attrs.get(name, _MISSING)
+            if val is not _MISSING:
+                self.set(row, name, val)
+        obj = object.__new__(self.proxy)
+        object.__setattr__(obj, "_row", row)
+        extra = {key: val for key, val in attrs.items()
+                 if key not in self.kinds and key != "__class__"}
+        if extra:
+            obj.__dict__.update(extra)
+            self.extra_rows.add(row)
+        return obj
+
+    def get(self, row, name):
+        """Returns the value of name at row, or _MISSING"""
+        flag = self.flags[name][row]
+        if flag == 1:
+            val = self.columns[name][row]
+            if self.kinds[name] == "t":
+                return EPOCH + val * MICROSECOND
+            return val
+        if flag == 2:
+            return self.overflow[name][row]
+        return _MISSING
+
+    def set(self, row, name, val):
+        """stores val as the value of name at row"""
+        kind = self.kinds[name]
+        flags = self.flags[name]
+        if flags[row] == 2:
+            del self.overflow[name][row]
+        try:
+            if kind == "t":
+                if isinstance(val, datetime):
+                    val = (val - EPOCH) // MICROSECOND
+                elif type(val) is not int:
+                    val = (decode_time(val) - EPOCH) // MICROSECOND
+            elif kind is None:
+                if type(val) is str and name.endswith("_id"):
+                    val = sys.intern(val)
+            elif type(val) is not _typeof(kind):
+                raise TypeError(name)
+            self.columns[name][row] = val
+            flags[row] = 1
+        except (TypeError, ValueError, OverflowError):
+            self.overflow[name][row] = val
+            flags[row] = 2
+
+    def unset(self, row, name):
+        """drops the value of name at row"""
+        if self.flags[name][row] == 2:
+            del self.overflow[name][row]
+        self.flags[name][row] = 0
+
+
+def _typeof(kind):
+    """Returns the Python type stored in arrays of typecode kind"""
+    return int if kind == "q" else float
+
+
+def _column(store, name):
+    """Returns the property reading and writing column name of store"""
+    default = store.defaults.get(name, _MISSING)
+
+    def getter(self):
+        val = store.get(self._row, name)
+        if val is _MISSING:
+            if default is _MISSING:
+                raise AttributeError(name)
+            return default
+        return val
+
+    def setter(self, val):
+        store.set(self._row, name, val)
+
+    def deleter(self):
+        if store.get(self._row, name) is _MISSING:
+            raise AttributeError(name)
+        store.unset(self._row, name)
+
+    return property(getter, setter, deleter)
+
+
+def _proxy_class(store):
+    """Returns the proxy class of the rows of store"""
+
+    def __setattr__(self, name, value):
+        if name not in store.kinds:
+            store.extra_rows.add(self._row)
+        store.cls.__setattr__(self, name, value)
+
+    def _attributes(self):
+        attrs = {}
+        for name in store.names:
+            val = store.get(self._row, name)
+            if val is not _MISSING:
+                attrs[name] = val
+        if self._row in store.extra_rows:
+            attrs.update(self.__dict__)
+        return attrs
+
+    def _set_attributes(self, attrs):
+        for name in store.names:
+            if name in attrs:
+                store.set(self._row, name, attrs[name])
+            else:
+                store.unset(self._row, name)
+        extra = {key: val for key, val in attrs.items()
+                 if key not in store.kinds}
+        if extra or self._row in store.extra_rows:
+            self.__dict__.clear()
+            self.__dict__.update(extra)
+            store.extra_rows.add(self._row)
+
+    namespace = {
+        "__slots__": ("_row",),
+        "__doc__": store.cls.__doc__,
+        "__module__": store.cls.__module__,
+        "__setattr__": __setattr__,
+        "_attributes": _attributes,
+        "_set_attributes": _set_attributes,
+    }
+    for name in store.names:
+        namespace[name] = _column(store, name)
+    return type(store.cls.__name__, (store.cls,), namespace, register=False)
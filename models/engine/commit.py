@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+"""
+    commit module: how the save() calls of FileStorage reach the disk
+    when they are grouped or written behind
+"""
+import threading
+import time
+
+
+class GroupCommit:
+    """
+        The GroupCommit class has the calls arriving within a window of
+        the first one share its commit, each returning or raising as it
+    """
+
+    def __init__(self):
+        self.__cond = threading.Condition()
+        self.__joining = None
+
+    def run(self, commit, window):
+        """calls commit once for the group of window seconds joined"""
+        with self.__cond:
+            group = self.__joining
+            if group is not None:
+                while not group["done"]:
+                    self.__cond.wait()
+                if group["error"] is not None:
+                    raise group["error"]
+                return
+            group = self.__joining = {"done": False, "error": None}
+        # lead this group: let the others join, then commit once for all
+        time.sleep(window)
+        with self.__cond:
+            self.__joining = None
+        try:
+            commit()
+        except BaseException as e:
+            group["error"] = e
+            raise
+        finally:
+            with self.__cond:
+                group["done"] = True
+                self.__cond.notify_all()
+
+
+class WriteBehind:
+    """
+        The WriteBehind class calls flush from a daemon thread every
+        interval seconds, or as soon as it is woken
+    """
+
+    def __init__(self, interval, flush):
+        self.interval = interval
+        self.flush = flush
+        self.__wake = threading.Event()
+        threading.Thread(target=self.__run, daemon=True).start()
+
+    def wake(self):
+        """has the thread flush now"""
+        self.__wake.set()
+
+    def __run(self):
+        """body of the thread"""
+        while True:
+            self.__wake.wait(self.interval)
+            self.__wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # the changes stay queued, the next flush() reports it
+                pass
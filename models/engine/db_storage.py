@@ -0,0 +1,377 @@
+#!/usr/bin/python3
+"""
+    db_storage module: a storage engine backed by the stdlib sqlite3
+    module that exposes the same API as FileStorage
+"""
+import json
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from os import getenv
+from models.base_model import registry as classes
+from models.engine.indexes import GeoIndex, TextIndex, text_attrs
+from models.engine.query import Query
+from models.engine.snapshot import Snapshot, detached
+
+_SQL_TYPES = {str: "TEXT", int: "INTEGER", float: "REAL", list: "TEXT"}
+
+
+def _columns(cls):
+    """Returns [(name, python type)] for the public attributes of cls"""
+    return [
+        (name, type(val)) for name, val in vars(cls).items()
+        if not name.startswith("_") and type(val) in _SQL_TYPES
+    ]
+
+
+def _fits(kind, val):
+    """Returns True if val can be stored in a column of python type kind"""
+    if type(val) is bool:
+        return False
+    if kind in (int, float) and type(val) is int:
+        return -1 << 63 <= val < 1 << 63
+    return isinstance(val, kind)
+
+
+class DBStorage:
+    """
+        The DBStorage class keeps one table per model class in a SQLite
+        database. Every table has the id, created_at and updated_at
+        columns, one column per public class attribute of the model and
+        an extra column holding any other attribute as JSON, as well as
+        the values that do not fit their column type. Columns named
+        <something>_id or listed in the model's _hash_indexes are indexed.
+
+        Instances are cached by key once loaded so repeated lookups give
+        back the same object. Only the rows of the objects created,
+        changed or deleted are written, in the open transaction before
+        the next query and committed by save().
+
+        The engine is not thread-safe, its SQLite connection belonging to
+        the thread that opened it: reading and writing, the locks
+        FileStorage holds in thread-safe mode, do nothing here.
+    """
+
+    def __init__(self, path=None):
+        """
+            path: the SQLite database file, defaults to the HBNB_SQLITE_DB
+                environment variable or hbnb.db
+        """
+        self.__path = path or getenv("HBNB_SQLITE_DB", "hbnb.db")
+        self.__conn = None
+        self.__in_batch = False
+        self.__objects = {}
+        self.__dirty = set()
+        self.__flushed = set()
+        self.__stamps = {}
+        self.__generation = 0
+        self.reading = self.writing = nullcontext()
+
+    def reload(self):
+        """opens the database and creates the missing tables"""
+        if self.__conn is not None:
+            self.__conn.close()
+        self.__conn = sqlite3.connect(self.__path, check_same_thread=False)
+        self.__objects = {}
+        self.__dirty = set()
+        self.__flushed = set()
+        self.__generation += 1
+        for name, cls in classes.items():
+            cols = "".join(
+                ", {} {}".format(col, _SQL_TYPES[kind])
+                for col, kind in _columns(cls)
+            )
+            self.__conn.execute(
+                "CREATE TABLE IF NOT EXISTS {} (id TEXT PRIMARY KEY, "
+                "created_at TEXT, updated_at TEXT{}, extra TEXT)".format(
+                    name, cols))
+            hashed = getattr(cls, "_hash_indexes", ())
+            for col, kind in _columns(cls):
+                if col.endswith("_id") or col in hashed:
+                    self.__conn.execute(
+                        "CREATE INDEX IF NOT EXISTS {0}_{1} "
+                        "ON {0} ({1})".format(name, col))
+        self.__conn.commit()
+
+    def all(self, cls=None):
+        """
+            Returns a dictionary of every stored object, or of the objects
+            of cls (a class or a class name) only
+        """
+        names = classes if cls is None else [self.__classname(cls)]
+        self.__flush()
+        objs = {}
+        for name in names:
+            if name not in classes:
+                continue
+            for row in self.__select(name, ""):
+                obj = self.__load(name, row)
+                objs[name + "." + obj.id] = obj
+        return objs
+
+    def count(self, cls=None):
+        """Returns the number of stored objects, or of cls only"""
+        if cls is None:
+            return sum(self.count(name) for name in classes)
+        name = self.__classname(cls)
+        if name not in classes:
+            return 0
+        self.__flush()
+        cur = self.__conn.execute("SELECT COUNT(*) FROM {}".format(name))
+        return cur.fetchone()[0]
+
+    def find(self, cls, attr, value):
+        """
+            Returns a dictionary of the objects of cls (a class or a class
+            name) whose attribute attr equals value
+        """
+        name = self.__classname(cls)
+        if name not in classes:
+            return {}
+        kinds = dict(_columns(classes[name]))
+        if attr != "id" and (attr not in kinds or
+                             not _fits(kinds[attr], value)):
+            return {
+                key: obj for key, obj in self.all(name).items()
+                if getattr(obj, attr, None) == value
+            }
+        where = " WHERE {0} = ?"
+        if attr != "id" and value == getattr(classes[name], attr):
+            # rows leaving attr unset hold NULL but read as the default
+            where += " OR {0} IS NULL"
+        if kinds.get(attr) is list:
+            value = json.dumps(value)
+        self.__flush()
+        objs = {}
+        for row in self.__select(name, where.format(attr), (value,)):
+            obj = self.__load(name, row)
+            objs[name + "." + obj.id] = obj
+        return objs
+
+    def near(self, cls, lat, lon, km):
+        """
+            Returns the (distance, object) pairs of the objects of cls
+            within km kilometres of (lat, lon), nearest first
+        """
+        return self.__ranked(cls, GeoIndex(("latitude", "longitude")),
+                             lambda index: index.near(lat, lon, km))
+
+    def nearest(self, cls, lat, lon, k):
+        """
+            Returns the (distance, object) pairs of the k objects of cls
+            nearest to (lat, lon), nearest first
+        """
+        return self.__ranked(cls, GeoIndex(("latitude", "longitude")),
+                             lambda index: index.nearest(lat, lon, k))
+
+    def search(self, cls, text, limit=None):
+        """
+            Returns the (score, object) pairs of the objects of cls whose
+            text attributes hold words of text, best match first
+        """
+        index = TextIndex(text_attrs(classes.get(self.__classname(cls))))
+        return self.__ranked(cls, index,
+                             lambda index: index.search(text, limit))
+
+    def __ranked(self, cls, index, search):
+        """
+            Returns the (rank, object) pairs search finds in index, filled
+            with the objects of cls for the call
+        """
+        objs = self.all(cls)
+        for key, obj in objs.items():
+            index.add(tuple(getattr(obj, attr, None)
+                            for attr in index.attrs), key)
+        return [(rank, objs[key]) for rank, key in search(index)]
+
+    def indexes(self, cls):
+        """
+            Returns the indexes query() may read from; SQLite picks its own
+            indexes for find(), so there are none here
+        """
+        return {}
+
+    def query(self, cls):
+        """Returns a Query over the objects of cls"""
+        return Query(self, cls)
+
+    def snapshot(self):
+        """
+            Returns a Snapshot of copies of the stored objects, so later
+            changes to the cached instances do not show through it
+        """
+        return Snapshot({key: detached(obj)
+                         for key, obj in self.all().items()})
+
+    def get(self, cls, id):
+        """Returns the object of cls (a class or a class name) with id"""
+        name = self.__classname(cls)
+        key = name + "." + id
+        if key in self.__objects:
+            return self.__objects[key]
+        if name not in classes:
+            return None
+        self.__flush()
+        rows = self.__select(name, " WHERE id = ?", (id,))
+        return self.__load(name, rows[0]) if rows else None
+
+    def new(self, obj):
+        """adds obj to the current session"""
+        key = obj.__class__.__name__ + "." + obj.id
+        self.__objects[key] = obj
+        self.__dirty.add(key)
+        self.__touch(obj.__class__.__name__)
+
+    def delete(self, obj=None):
+        """removes obj from the current session"""
+        if obj is None:
+            return
+        key = obj.__class__.__name__ + "." + obj.id
+        self.__objects.pop(key, None)
+        self.__dirty.add(key)
+        self.__touch(obj.__class__.__name__)
+
+    def dirty_count(self):
+        """Returns the number of keys changed since the last save"""
+        return len(self.__dirty | self.__flushed)
+
+    def mark_dirty(self, obj, name=None, value=None):
+        """
+            flags obj for the next save if it is the stored instance;
+            BaseModel calls it right before assigning value to attribute
+            name of obj
+        """
+        obj_id = obj.__dict__.get("id")
+        if obj_id is None:
+            return
+        key = obj.__class__.__name__ + "." + obj_id
+        if self.__objects.get(key) is obj:
+            self.__dirty.add(key)
+            self.__touch(obj.__class__.__name__)
+
+    def stamp(self, cls):
+        """
+            Returns a value changing whenever an object of cls (a class or
+            a class name) is stored, removed or assigned to through this
+            engine, so results derived from them can be cached against it
+        """
+        return self.__generation, self.__stamps.get(self.__classname(cls), 0)
+
+    def save(self):
+        """writes the rows of the changed objects and commits"""
+        self.__flush()
+        if self.__in_batch:
+            return
+        self.__conn.commit()
+        self.__flushed.clear()
+
+    @contextmanager
+    def batch(self):
+        """
+            Runs the with block in one transaction: save() calls inside it
+            do not commit, the block is committed on exit and rolled back
+            if it raises. Instances changed in the block are dropped from
+            the cache on rollback so they are read back from the database.
+        """
+        if self.__in_batch:
+            yield self
+            return
+        self.__in_batch = True
+        try:
+            yield self
+        except BaseException:
+            self.__conn.rollback()
+            self.__generation += 1
+            self.__objects = {}
+            self.__dirty = set()
+            self.__flushed = set()
+            raise
+        finally:
+            self.__in_batch = False
+        self.save()
+
+    transaction = batch
+
+    def flush(self):
+        """commits the pending changes"""
+        self.save()
+
+    def refresh(self):
+        """
+            does nothing: every query already reads what other connections
+            committed; Returns 0
+        """
+        return 0
+
+    def close(self):
+        """closes the database connection"""
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
+
+    @staticmethod
+    def __classname(cls):
+        """Returns the name of cls, which may already be a name"""
+        return cls if isinstance(cls, str) else cls.__name__
+
+    def __touch(self, name):
+        """moves the stamp of class name on"""
+        self.__stamps[name] = self.__stamps.get(name, 0) + 1
+
+    def __flush(self):
+        """
+            writes the changed rows in the open transaction so queries see
+            them; they are committed by save()
+        """
+        for key in self.__dirty:
+            name, obj_id = key.split(".", 1)
+            obj = self.__objects.get(key)
+            if obj is None:
+                self.__conn.execute(
+                    "DELETE FROM {} WHERE id = ?".format(name), (obj_id,))
+            else:
+                self.__write(name, obj)
+        self.__flushed |= self.__dirty
+        self.__dirty.clear()
+
+    def __select(self, name, where, params=()):
+        """Returns the rows of table name matching the where clause"""
+        cur = self.__conn.execute(
+            "SELECT * FROM {}{}".format(name, where), params)
+        return cur.fetchall()
+
+    def __load(self, name, row):
+        """Returns the cached instance for row, building it if needed"""
+        key = name + "." + row[0]
+        obj = self.__objects.get(key)
+        if obj is not None:
+            return obj
+        cls = classes[name]
+        kwargs = {"id": row[0], "created_at": row[1], "updated_at": row[2]}
+        for (col, kind), val in zip(_columns(cls), row[3:-1]):
+            if val is not None:
+                kwargs[col] = json.loads(val) if kind is list else val
+        if row[-1]:
+            kwargs.update(json.loads(row[-1]))
+        obj = cls(**kwargs)
+        self.__objects[key] = obj
+        return obj
+
+    def __write(self, name, obj):
+        """inserts or replaces the row of obj"""
+        record = obj.to_dict()
+        record.pop("__class__", None)
+        values = [record.pop("id"), record.pop("created_at"),
+                  record.pop("updated_at")]
+        for col, kind in _columns(classes[name]):
+            val = record.pop(col, None)
+            if val is not None and not _fits(kind, val):
+                # kept in extra, which overrides the NULL column on load
+                record[col] = val
+                val = None
+            elif val is not None and kind is list:
+                val = json.dumps(val)
+            values.append(val)
+        values.append(json.dumps(record) if record else None)
+        self.__conn.execute(
+            "INSERT OR REPLACE INTO {} VALUES ({})".format(
+                name, ", ".join("?" * len(values))), values)
@@ -2,15 +2,31 @@
 """
     Task 6: file_storage module
 """
-import json
+import atexit
+from contextlib import contextmanager, nullcontext
 import os
-from models.base_model import BaseModel
-from models.user import User
-from models.state import State
-from models.city import City
-from models.amenity import Amenity
-from models.place import Place
-from models.review import Review
+import threading
+import time
+from models.base_model import registry
+from models.engine.columnar import ColumnStore
+from models.engine.commit import GroupCommit, WriteBehind
+from models.engine.files import COMPRESSORS, install, open_snapshot
+from models.engine.files import shard_file, shard_files, shard_of
+from models.engine.files import shard_of_file
+from models.engine.files import signature, sizes, write_file
+from models.engine.indexes import GeoIndex, TextIndex, indexes_for
+from models.engine.indexes import text_attrs
+from models.engine.journal import log_text, read_log, rotate, segments
+from models.engine.journal import trim_torn_tail
+from models.engine.locks import LockFile, RWLock
+from models.engine.query import Query
+from models.engine.serializers import SERIALIZERS, detect
+from models.engine.snapshot import Snapshot, detached
+
+
+class _Batch(threading.local):
+    """the batch a thread has open: the undo records of its changes"""
+    undo = None
 
 
 class FileStorage:
@@ -22,33 +38,973 @@ class FileStorage:
     """
     __file_path = "file.json"
     __objects = {}
+    __dirty = set()
+    __encoded = {}
+    __classes = {}
+    __raw = set()
+    __stores = {}
+    __indexes = {}
+    __stamps = {}
+    __snapshots = []
+    __frozen = False
+    __encoding = "json"
+    compact_min_bytes = 1 << 16
+
+    def __init__(self, *, journal=False, lazy=False, shards=0,
+                 fsync=False, group_commit=0, write_behind=0,
+                 flush_threshold=0, compression=None,
+                 compression_level=None, epoch_timestamps=False,
+                 columnar=False, shared=False, compact_bytes=0,
+                 compact_ratio=0, threadsafe=False, serializer="json"):
+        """
+            journal: save() appends the changes to <__file_path>.log
+            lazy: reload() builds each instance when first read
+            shards: 1 for a snapshot file per class, n > 1 for n per class
+            fsync: save() returns once the files are on disk
+            group_commit: milliseconds during which save() calls share
+                one write
+            write_behind: seconds between the writes of a background
+                thread, save() only queueing the changes; flush_threshold
+                queued changes wake it sooner
+            compression: "gzip", "zlib" or "lzma" at compression_level
+            epoch_timestamps: timestamps stored as integer microseconds
+            columnar: reload() keeps the attributes in column stores
+            shared: several processes may use the files at once
+            compact_bytes, compact_ratio: log size, absolute or relative
+                to the snapshot, past which a save compacts the log
+            threadsafe: threads may share the storage
+            serializer: "json", "marshal" or "binary" snapshot files
+        """
+        if compression is not None and compression not in COMPRESSORS:
+            raise ValueError("unknown compression: {}".format(compression))
+        if serializer not in SERIALIZERS:
+            raise ValueError("unknown serializer: {}".format(serializer))
+        self.serializer = SERIALIZERS[serializer]
+        self.journal = journal
+        self.lazy = lazy
+        self.shards = shards
+        self.fsync = fsync
+        self.group_commit = group_commit
+        self.compression = compression
+        self.compression_level = compression_level
+        self.epoch_timestamps = epoch_timestamps
+        self.columnar = columnar
+        self.shared = shared
+        self.compact_bytes = compact_bytes
+        self.threadsafe = threadsafe
+        if threadsafe:
+            rwlock = RWLock()
+            self.reading, self.writing = rwlock.reading, rwlock.writing
+        else:
+            self.reading = self.writing = nullcontext()
+        self.compact_ratio = compact_ratio
+        self.compaction_stats = {
+            "compactions": 0, "abandoned": 0, "seconds": 0.0,
+            "bytes_reclaimed": 0, "last_seconds": None,
+            "last_bytes_reclaimed": None,
+        }
+        self.__compaction = threading.Lock()
+        self.__snapshot_bytes = None
+        self.__generation = None
+        self.__signatures = {}
+        self.__log_offset = 0
+        self.__commit_lock = threading.Lock()
+        self.__group = GroupCommit()
+        # taken after the RWLock, itself taken after the lock file
+        self.__lock = threading.RLock()
+        self.__unflushed = []
+        self.__batch = _Batch()
+        self.write_behind = write_behind
+        self.flush_threshold = flush_threshold
+        if write_behind:
+            self.__writer = WriteBehind(write_behind, self.__flush_queued)
+            atexit.register(self.__flush_at_exit)
 
-    def all(self):
-        """Returns the dictionary __objects"""
-        return FileStorage.__objects
+    def dirty_count(self):
+        """Returns the number of keys changed since the last save"""
+        return len(FileStorage.__dirty)
+
+    def mark_dirty(self, obj, name=None, value=None):
+        """
+            flags obj for the next save before value is assigned to its
+            attribute name; call it with obj alone before changing obj in
+            place (e.g. appending to a list) or that change is not saved
+        """
+        obj_id = getattr(obj, "id", None)
+        if obj_id is None:
+            return
+        with self.writing:
+            self.__mark_dirty(obj, obj_id, name, value)
+
+    def __mark_dirty(self, obj, obj_id, name, value):
+        """flags obj, holding the write lock"""
+        classname = obj.__class__.__name__
+        key = classname + "." + obj_id
+        if FileStorage.__objects.get(key) is obj:
+            if FileStorage.__snapshots:
+                self.__preserve(key, obj)
+            if self.__batch.undo is not None:
+                self.__remember(key)
+            FileStorage.__dirty.add(key)
+            self.__touch(classname)
+            for index in self.__indexes_of(classname).values():
+                if name in index.attrs:
+                    old = self.__value(obj, index)
+                    index.remove(old, key)
+                    if len(index.attrs) == 1:
+                        index.add(value, key)
+                    else:
+                        index.add(tuple(
+                            value if attr == name else val
+                            for attr, val in zip(index.attrs, old)), key)
+
+    @contextmanager
+    def batch(self):
+        """
+            saves the changes of the with block once on exit, or undoes
+            them if it raises; a nested batch is part of the outer one, and
+            other threads wait for the block in thread-safe mode
+        """
+        if self.__batch.undo is not None:
+            yield self
+            return
+        with self.writing:
+            with self.__lock:
+                self.__batch.undo = {}
+                dirty = set(FileStorage.__dirty)
+            try:
+                yield self
+            except BaseException:
+                with self.__lock:
+                    self.__rollback()
+                    FileStorage.__dirty.clear()
+                    FileStorage.__dirty.update(dirty)
+                raise
+            finally:
+                self.__batch.undo = None
+        self.save()
+
+    transaction = batch
+
+    def all(self, cls=None):
+        """
+            Returns the dictionary __objects (a copy in thread-safe mode),
+            or a dictionary of the objects of cls (a class or a class
+            name) only
+        """
+        with self.reading:
+            raw = FileStorage.__raw
+            if cls is None:
+                for key in list(raw):
+                    self.__materialize(key)
+                if self.threadsafe:
+                    return dict(FileStorage.__objects)
+                return FileStorage.__objects
+            bucket = FileStorage.__classes.get(self.__classname(cls), {})
+            if raw:
+                for key in [key for key in bucket if key in raw]:
+                    self.__materialize(key)
+            return dict(bucket)
+
+    def snapshot(self):
+        """
+            Returns a Snapshot of the stored objects, read consistently
+            while others change them; close it, or use it in a with
+            statement, once read
+        """
+        with self.reading, self.__lock:
+            snap = Snapshot(FileStorage.__objects, FileStorage.__classes,
+                            self.__release, self.reading)
+            FileStorage.__snapshots.append(snap)
+            FileStorage.__frozen = True
+        return snap
+
+    def __release(self, snap):
+        """forgets a closed snapshot"""
+        with self.__lock:
+            FileStorage.__snapshots.remove(snap)
+            FileStorage.__frozen = any(
+                other.objects is FileStorage.__objects
+                for other in FileStorage.__snapshots)
+
+    @staticmethod
+    def __thaw():
+        """copies the dictionaries an open snapshot shares before a change"""
+        if FileStorage.__frozen:
+            FileStorage.__objects = dict(FileStorage.__objects)
+            FileStorage.__classes = {
+                name: dict(bucket)
+                for name, bucket in FileStorage.__classes.items()}
+            FileStorage.__frozen = False
+
+    @staticmethod
+    def __preserve(key, obj):
+        """keeps obj as it is in the open snapshots holding it"""
+        copy = None
+        for snap in FileStorage.__snapshots:
+            if key not in snap.versions and snap.objects.get(key) is obj:
+                if copy is None:
+                    copy = detached(obj)
+                snap.versions[key] = copy
+
+    def get(self, cls, id):
+        """Returns the object of cls (a class or a class name) with id"""
+        key = self.__classname(cls) + "." + id
+        with self.reading:
+            if key in FileStorage.__raw:
+                self.__materialize(key)
+            return FileStorage.__objects.get(key)
+
+    def stamp(self, cls):
+        """
+            Returns a number changing whenever an object of cls (a class
+            or a class name) is stored, removed or assigned to, so results
+            derived from those objects can be cached against it
+        """
+        return FileStorage.__stamps.get(self.__classname(cls), 0)
+
+    def find(self, cls, attr, value):
+        """
+            Returns a dictionary of the objects of cls (a class or a class
+            name) whose attribute attr equals value, read from the index
+            on attr if cls has one
+        """
+        classname = self.__classname(cls)
+        with self.reading:
+            index = self.__indexes_of(classname).get(attr)
+            keys = None if index is None else index.keys("eq", value)
+            if keys is None:
+                return {
+                    key: obj for key, obj in self.all(classname).items()
+                    if getattr(obj, attr, None) == value
+                }
+            found = {}
+            for key in keys:
+                if key in FileStorage.__raw:
+                    self.__materialize(key)
+                found[key] = FileStorage.__objects[key]
+            return found
+
+    def near(self, cls, lat, lon, km):
+        """
+            Returns the (distance, object) pairs of the objects of cls
+            within km kilometres of (lat, lon), nearest first
+        """
+        return self.__ranked(cls, "geo", lambda index: index.near(
+            lat, lon, km))
+
+    def nearest(self, cls, lat, lon, k):
+        """
+            Returns the (distance, object) pairs of the k objects of cls
+            nearest to (lat, lon), nearest first
+        """
+        return self.__ranked(cls, "geo", lambda index: index.nearest(
+            lat, lon, k))
+
+    def search(self, cls, text, limit=None):
+        """
+            Returns the (score, object) pairs of the objects of cls whose
+            indexed text holds words of text, best match first
+        """
+        return self.__ranked(cls, "text", lambda index: index.search(
+            text, limit))
+
+    def __ranked(self, cls, kind, search):
+        """
+            Returns the (rank, object) pairs search finds in the index of
+            kind of cls, or in one built over its objects for the call if
+            it has none
+        """
+        classname = self.__classname(cls)
+        with self.reading:
+            for index in self.__indexes_of(classname).values():
+                if index.kind == kind:
+                    break
+            else:
+                if kind == "geo":
+                    index = GeoIndex(("latitude", "longitude"))
+                else:
+                    index = TextIndex(text_attrs(registry.get(classname)))
+                for key, obj in self.all(classname).items():
+                    index.add(self.__value(obj, index), key)
+            found = []
+            for rank, key in search(index):
+                if key in FileStorage.__raw:
+                    self.__materialize(key)
+                found.append((rank, FileStorage.__objects[key]))
+            return found
+
+    def indexes(self, cls):
+        """
+            Returns the indexes kept on the attributes of cls (a class or
+            a class name), by attribute name
+        """
+        return dict(self.__indexes_of(self.__classname(cls)))
+
+    def query(self, cls):
+        """Returns a Query over the objects of cls"""
+        return Query(self, cls)
+
+    def count(self, cls=None):
+        """Returns the number of objects stored, or of cls only"""
+        with self.reading:
+            if cls is None:
+                return len(FileStorage.__objects)
+            return len(FileStorage.__classes.get(self.__classname(cls),
+                                                 ()))
 
     def new(self, obj):
         """sets in __objects the obj with key <obj class name>.id"""
+        classname = obj.__class__.__name__
+        key = classname + "." + obj.id
+        with self.writing, self.__lock:
+            if self.__batch.undo is not None:
+                self.__remember(key)
+            self.__add(classname, key, obj)
+            FileStorage.__raw.discard(key)
+            FileStorage.__dirty.add(key)
+
+    def delete(self, obj=None):
+        """removes obj from __objects if it is there"""
+        if obj is None:
+            return
         key = obj.__class__.__name__ + "." + obj.id
-        FileStorage.__objects[key] = obj
+        with self.writing, self.__lock:
+            if self.__batch.undo is not None:
+                self.__remember(key)
+            if self.__remove(key):
+                FileStorage.__dirty.add(key)
 
     def save(self):
         """ serializes __objects to the JSON file """
-        dump = {k: val.to_dict() for k, val in FileStorage.__objects.items()}
-        with open(FileStorage.__file_path, "w") as f:
-            f.write(json.dumps(dump))
+        if self.__batch.undo is not None:
+            return
+        if self.write_behind:
+            # the objects are encoded here: the flusher thread writes the
+            # queued encodings and never reads live instances
+            with self.writing, self.__lock:
+                self.__recode()
+                self.__unflushed.extend(self.__encode_dirty())
+                pending = len(self.__unflushed)
+            if self.flush_threshold and pending >= self.flush_threshold:
+                self.__writer.wake()
+        elif self.group_commit:
+            self.__group.run(self.flush, self.group_commit / 1000)
+        else:
+            self.flush()
+
+    def flush(self):
+        """writes every change saved or made so far before returning"""
+        with self.__commit_lock:
+            self.__commit()
 
-    def reload(self):
+    def __flush_at_exit(self):
+        """writes what save() queued but the flusher did not write yet"""
+        if self.__unflushed:
+            self.flush()
+
+    def __flush_queued(self):
+        """writes what save() queued, from the write-behind thread"""
+        if self.__unflushed:
+            with self.__commit_lock:
+                self.__commit(saved_only=True)
+
+    def __commit(self, saved_only=False):
         """
-            deserializes the JSON file to __objects
-            (only if the JSON file (__file_path) exits otherwise do nothing
+            writes the pending changes to the log or the snapshot; with
+            saved_only, only the changes already queued by save()
         """
+        with self.__locked(exclusive=True) as lock:
+            with self.writing, self.__lock:
+                self.__recode()
+                if lock is not None:
+                    self.__refresh(lock)
+                changes = self.__unflushed
+                if not saved_only:
+                    changes = changes + self.__encode_dirty()
+                self.__unflushed = []
+                plan = self.__plan(changes, saved_only)
+            try:
+                self.__apply(plan)
+            except BaseException:
+                with self.__lock:
+                    self.__unflushed = changes + self.__unflushed
+                raise
+            if lock is not None and plan:
+                self.__bump(lock)
+        if plan and self.journal and self.__compaction_due():
+            if self.__compaction.acquire(blocking=False):
+                threading.Thread(target=self.__compact_in_background,
+                                 daemon=True).start()
+
+    def __bump(self, lock):
+        """records a new generation of the files in shared mode"""
+        self.__generation += 1
+        LockFile.set_generation(lock, self.__generation)
+        self.__remember_files()
+
+    def __compaction_due(self):
+        """Returns True if the log went past a compaction threshold"""
+        if not self.compact_bytes and not self.compact_ratio:
+            return False
+        log_bytes = sizes([FileStorage.__file_path + ".log"])
+        if self.compact_bytes and log_bytes >= self.compact_bytes:
+            return True
+        if not self.compact_ratio or log_bytes < self.compact_min_bytes:
+            return False
+        if self.__snapshot_bytes is None:
+            self.__snapshot_bytes = sizes(self.__snapshot_files())
+        return log_bytes >= self.compact_ratio * self.__snapshot_bytes
+
+    def __compact_in_background(self):
+        """body of the compaction thread started by a save"""
         try:
-            with open(FileStorage.__file_path, "r") as f:
-                paydict = json.load(f)
-                for key, val in paydict.items():
-                    classname = key.split(".")[0]
-                    cls = eval(classname)
-                    self.new(cls(**val))
-        except FileNotFoundError:
+            self.__compact()
+        except Exception:
+            # the log segment stays, the next compaction folds it in
+            pass
+        finally:
+            self.__compaction.release()
+
+    def compact(self):
+        """
+            folds the journal log into a new snapshot; Returns the
+            duration in seconds and the bytes reclaimed as a dictionary,
+            or None if a snapshot file was rewritten meanwhile
+        """
+        with self.__compaction:
+            return self.__compact()
+
+    def __compact(self):
+        """rotates the log, writes the snapshot, then swaps it in"""
+        start = time.perf_counter()
+        with self.__commit_lock:
+            with self.__locked(exclusive=True) as lock:
+                with self.writing, self.__lock:
+                    self.__recode()
+                    if lock is not None:
+                        self.__refresh(lock)
+                    records = dict(self.__saved_records())
+                signatures = {path: signature(path)
+                              for path in self.__snapshot_files()}
+                frozen = rotate(FileStorage.__file_path + ".log")
+                if lock is not None:
+                    self.__bump(lock)
+        groups = {}
+        if not self.shards:
+            groups[FileStorage.__file_path] = []
+        for key, encoded in records.items():
+            groups.setdefault(self.__path_of(key), []).append(
+                (key, encoded))
+        for path, pairs in groups.items():
+            self.__write_file(path + ".compacting",
+                              self.serializer.join(pairs))
+        with self.__commit_lock:
+            with self.__locked(exclusive=True) as lock:
+                current = self.__snapshot_files()
+                if {path: signature(path) for path in current} != \
+                        signatures:
+                    # rewritten by a save in snapshot mode, which also
+                    # dropped the log: this snapshot would be older
+                    for path in groups:
+                        os.remove(path + ".compacting")
+                    self.compaction_stats["abandoned"] += 1
+                    return None
+                before = sizes(current + [frozen])
+                for path in groups:
+                    install(path + ".compacting", path, self.fsync)
+                for path in current:
+                    if path not in groups:
+                        os.remove(path)
+                if os.path.exists(frozen):
+                    os.remove(frozen)
+                self.__snapshot_bytes = sizes(groups)
+                if lock is not None:
+                    self.__bump(lock)
+        run = {"seconds": time.perf_counter() - start,
+               "bytes_reclaimed": before - self.__snapshot_bytes}
+        stats = self.compaction_stats
+        stats["compactions"] += 1
+        stats["seconds"] += run["seconds"]
+        stats["bytes_reclaimed"] += run["bytes_reclaimed"]
+        stats["last_seconds"] = run["seconds"]
+        stats["last_bytes_reclaimed"] = run["bytes_reclaimed"]
+        return run
+
+    def __snapshot_files(self):
+        """Returns the existing snapshot files"""
+        paths = shard_files(FileStorage.__file_path)
+        if os.path.exists(FileStorage.__file_path):
+            paths.insert(0, FileStorage.__file_path)
+        return paths
+
+    def refresh(self):
+        """
+            reads in the changes other processes saved since this one last
+            read or wrote the files, in shared mode; Returns the number of
+            keys updated or removed
+        """
+        if not self.shared:
+            return 0
+        with self.__locked(exclusive=False) as lock:
+            with self.writing, self.__lock:
+                self.__recode()
+                return self.__refresh(lock)
+
+    @contextmanager
+    def __locked(self, exclusive):
+        """
+            holds the lock file of the storage in shared mode and gives it
+            to the with block, or gives None otherwise
+        """
+        if not self.shared:
+            yield None
+            return
+        with LockFile(FileStorage.__file_path + ".lock").held(exclusive) as f:
+            yield f
+
+    def __remember_files(self):
+        """records the state of the files as this process last saw them"""
+        paths = [FileStorage.__file_path] + \
+            shard_files(FileStorage.__file_path)
+        self.__signatures = {path: signature(path) for path in paths}
+        log = FileStorage.__file_path + ".log"
+        self.__signatures[log] = signature(log)
+        self.__log_offset = (self.__signatures[log] or (0, 0))[1]
+
+    def __refresh(self, lock):
+        """
+            applies what other processes saved if the generation moved on;
+            Returns the number of keys updated or removed
+        """
+        generation = LockFile.generation(lock)
+        if generation == self.__generation:
+            return 0
+        pending = set(FileStorage.__dirty)
+        pending.update(key for key, _ in self.__unflushed)
+        log = FileStorage.__file_path + ".log"
+        paths = [FileStorage.__file_path] + \
+            shard_files(FileStorage.__file_path)
+        stale = [
+            path for path in set(paths) | set(self.__signatures)
+            if path != log and
+            signature(path) != self.__signatures.get(path)
+        ]
+        changed = 0
+        if stale:
+            owners = {}
+            for key in FileStorage.__encoded:
+                owners.setdefault(self.__path_of(key), []).append(key)
+            for path in stale:
+                seen = set()
+                try:
+                    for key, val, text in self.__records(path):
+                        seen.add(key)
+                        changed += self.__take(key, val, text, pending)
+                except FileNotFoundError:
+                    pass
+                for key in owners.get(path, ()):
+                    if key not in seen:
+                        changed += self.__take(key, None, None, pending)
+            self.__snapshot_bytes = None
+        for path, offset in segments(log, self.__signatures.get(log),
+                                     self.__log_offset, bool(stale)):
+            changed += self.__tail_log(path, offset, pending)
+        self.__generation = generation
+        self.__remember_files()
+        return changed
+
+    def __take(self, key, val, text, pending):
+        """
+            applies a record another process saved (val None when it
+            deleted key) unless key has unsaved changes here; Returns 1 if
+            it changed anything, 0 otherwise
+        """
+        if key in pending:
+            return 0
+        if val is None:
+            FileStorage.__encoded.pop(key, None)
+            return 1 if self.__remove(key) else 0
+        if FileStorage.__encoded.get(key) == text and \
+                key in FileStorage.__objects:
+            return 0
+        self.__put(key, val)
+        FileStorage.__encoded[key] = text
+        return 1
+
+    def __tail_log(self, path, offset, pending):
+        """
+            applies the complete records of the log at path written past
+            offset; Returns the number of keys changed
+        """
+        changed = 0
+        for entry in read_log(path, offset):
+            value = entry.get("value")
+            text = None if value is None else self.serializer.encode(value)
+            changed += self.__take(entry["key"], value, text, pending)
+        return changed
+
+    def __path_of(self, key):
+        """Returns the snapshot file holding key"""
+        if not self.shards:
+            return FileStorage.__file_path
+        return shard_file(FileStorage.__file_path, shard_of(key, self.shards))
+
+    def __plan(self, changes, saved_only=False):
+        """
+            Returns the file operations persisting changes as a list of
+            (operation, path, text) with operation in append/write/remove;
+            with saved_only, the snapshot holds the saved encodings only
+        """
+        path = FileStorage.__file_path
+        log = path + ".log"
+        if self.journal:
+            text = log_text(changes, self.serializer.to_json)
+            return [("append", log, text)] if text else []
+        if self.shards:
+            if os.path.exists(path) or os.path.exists(log) or \
+                    not self.__layout_matches():
+                plan = self.__shards_plan(None, saved_only)
+            else:
+                plan = self.__shards_plan(
+                    {shard_of(key, self.shards) for key, _ in changes},
+                    saved_only)
+            paths = [path]
+        else:
+            keys = self.__saved_records() if saved_only else \
+                FileStorage.__objects
+            plan = [("write", path, self.__records_text(keys))]
+            paths = shard_files(path)
+        paths += [log, log + ".1"]
+        return plan + [("remove", name, None) for name in paths]
+
+    def __layout_matches(self):
+        """Returns False if a shard file was written for other shards"""
+        path = FileStorage.__file_path
+        for name in shard_files(path):
+            bucket = shard_of_file(path, name)[1]
+            if (bucket is None) != (self.shards == 1) or \
+                    bucket is not None and bucket >= self.shards:
+                return False
+        return True
+
+    def __apply(self, plan):
+        """performs the file operations of a plan"""
+        for operation, path, text in plan:
+            if operation == "remove":
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            if operation == "append":
+                trim_torn_tail(path)
+                self.__write_file(path, text, "a")
+            else:
+                self.__write_file(path + ".tmp", text)
+                install(path + ".tmp", path, self.fsync)
+
+    def __write_file(self, path, text, mode="w"):
+        """writes text (or bytes) to path, compressed unless appended"""
+        write_file(path, text, mode, self.compression,
+                   self.compression_level, self.fsync)
+
+    def reload(self, cls=None):
+        """
+            deserializes the snapshot files and the journal log to
+            __objects, one record at a time; of cls only if given
+        """
+        with self.__locked(exclusive=False) as lock, self.writing:
+            self.__load(cls)
+            if lock is not None and cls is None:
+                self.__generation = LockFile.generation(lock)
+                self.__remember_files()
+
+    def __load(self, cls=None):
+        """reads the snapshot files and the log, of cls only if given"""
+        self.__recode()
+        name = None if cls is None else self.__classname(cls)
+        paths = [FileStorage.__file_path] + \
+            shard_files(FileStorage.__file_path, name)
+        if name is None:
+            self.__snapshot_bytes = None
+            FileStorage.__stores.clear()
+        else:
+            FileStorage.__stores.pop(name, None)
+        # the encodings are kept where the saved state is read back without
+        # a save: by compactions, refreshes and the write-behind thread;
+        # otherwise the first save encodes the objects
+        keep = self.journal or self.shared or self.write_behind
+        encoded = FileStorage.__encoded
+        for path in paths:
+            try:
+                for key, val, text in self.__records(path, keep):
+                    if name is None or key.split(".")[0] == name:
+                        self.__put(key, val)
+                        if keep:
+                            encoded[key] = text
+                        else:
+                            encoded.pop(key, None)
+            except FileNotFoundError:
+                pass
+        self.__replay_log(name)
+
+    def __recode(self):
+        """re-encodes the cached records if another serializer wrote them"""
+        if FileStorage.__encoding == self.serializer.name:
+            return
+        old = SERIALIZERS[FileStorage.__encoding]
+        encoded = FileStorage.__encoded
+        for key, text in encoded.items():
+            encoded[key] = self.serializer.encode(old.decode(text))
+        self.__unflushed = [
+            (key, text if text is None else
+             self.serializer.encode(old.decode(text)))
+            for key, text in self.__unflushed]
+        FileStorage.__encoding = self.serializer.name
+
+    def __records(self, path, texts=True):
+        """
+            yields (key, record, encoding) for the records of the snapshot
+            file at path, encoded by the serializer of the storage whatever
+            the one which wrote the file, unless texts is False
+        """
+        with open_snapshot(path) as f:
+            serializer, head = detect(f)
+            for key, val, text in serializer.records(f, head):
+                if texts and serializer is not self.serializer:
+                    text = self.serializer.encode(val)
+                yield key, val, text
+
+    @staticmethod
+    def __classname(cls):
+        """Returns the name of cls, which may already be a name"""
+        return cls if isinstance(cls, str) else cls.__name__
+
+    def __put(self, key, val):
+        """
+            builds the model instance for a stored record, or keeps the
+            record itself in lazy mode
+        """
+        classname = key.split(".")[0]
+        if self.columnar:
+            store = FileStorage.__stores.get(classname)
+            if store is None:
+                store = ColumnStore(registry[classname])
+                FileStorage.__stores[classname] = store
+            obj = store.add(val)
+            FileStorage.__raw.discard(key)
+        elif self.lazy:
+            obj = val
+            FileStorage.__raw.add(key)
+        else:
+            obj = registry[classname](**val)
+            FileStorage.__raw.discard(key)
+        self.__add(classname, key, obj)
+        FileStorage.__dirty.discard(key)
+
+    def __add(self, classname, key, obj):
+        """stores obj under key in __objects and the indexes"""
+        self.__thaw()
+        old = FileStorage.__objects.get(key)
+        if old is not None:
+            self.__unindex(classname, key, old)
+        FileStorage.__objects[key] = obj
+        FileStorage.__classes.setdefault(classname, {})[key] = obj
+        self.__touch(classname)
+        for index in self.__indexes_of(classname).values():
+            index.add(self.__value(obj, index), key)
+
+    def __unindex(self, classname, key, obj):
+        """drops key from the indexes of classname"""
+        for index in self.__indexes_of(classname).values():
+            index.remove(self.__value(obj, index), key)
+
+    @staticmethod
+    def __touch(classname):
+        """moves the stamp of classname on"""
+        FileStorage.__stamps[classname] = \
+            FileStorage.__stamps.get(classname, 0) + 1
+
+    @staticmethod
+    def __indexes_of(classname):
+        """Returns the indexes of classname by attribute name"""
+        indexes = FileStorage.__indexes.get(classname)
+        if indexes is None:
+            indexes = FileStorage.__indexes.setdefault(
+                classname, indexes_for(registry.get(classname)))
+        return indexes
+
+    @staticmethod
+    def __value(obj, index):
+        """
+            Returns the value of obj, an instance or a raw record, in index:
+            its attribute, or the tuple of its attributes for an index on
+            several
+        """
+        if isinstance(obj, dict):
+            cls = registry.get(obj.get("__class__"))
+            values = tuple(obj.get(attr, getattr(cls, attr, None))
+                           for attr in index.attrs)
+        else:
+            values = tuple(getattr(obj, attr, None) for attr in index.attrs)
+        return values[0] if len(values) == 1 else values
+
+    def __materialize(self, key):
+        """replaces the raw record stored under key by its model"""
+        with self.__lock:
+            if key not in FileStorage.__raw:
+                return
+            classname = key.split(".")[0]
+            obj = registry[classname](**FileStorage.__objects[key])
+            FileStorage.__objects[key] = obj
+            FileStorage.__classes[classname][key] = obj
+            FileStorage.__raw.discard(key)
+
+    def __remember(self, key):
+        """records the state of key before the batch first changes it"""
+        if key in self.__batch.undo:
             return
+        obj = FileStorage.__objects.get(key)
+        if obj is None or key in FileStorage.__raw:
+            self.__batch.undo[key] = (obj, None)
+        else:
+            self.__batch.undo[key] = (obj, dict(obj._attributes()))
+
+    def __rollback(self):
+        """puts back the objects recorded since the batch started"""
+        for key, (obj, attrs) in self.__batch.undo.items():
+            self.__remove(key)
+            if obj is None:
+                continue
+            if attrs is not None:
+                self.__preserve(key, obj)
+                obj._set_attributes(attrs)
+            else:
+                FileStorage.__raw.add(key)
+            self.__add(key.split(".")[0], key, obj)
+
+    def __remove(self, key):
+        """drops key from __objects, the class index and hash indexes"""
+        if key not in FileStorage.__objects:
+            return False
+        self.__thaw()
+        obj = FileStorage.__objects.pop(key)
+        classname = key.split(".")[0]
+        self.__unindex(classname, key, obj)
+        self.__touch(classname)
+        FileStorage.__raw.discard(key)
+        bucket = FileStorage.__classes.get(classname)
+        if bucket is not None:
+            bucket.pop(key, None)
+        return True
+
+    def __shards_plan(self, shards, saved_only=False):
+        """
+            Returns the operations rewriting the given (class name,
+            bucket) shards, or all of them, of the saved encodings only
+            with saved_only
+        """
+        plan = []
+        classes = FileStorage.__classes
+        if saved_only:
+            classes = {}
+            for key in self.__saved_records():
+                classes.setdefault(key.split(".")[0], []).append(key)
+        if shards is None:
+            plan = [("remove", path, None)
+                    for path in shard_files(FileStorage.__file_path)]
+            names = list(classes)
+        else:
+            names = {classname for classname, bucket in shards}
+        for classname in names:
+            groups = {}
+            for key in classes.get(classname, ()):
+                groups.setdefault(shard_of(key, self.shards), []).append(key)
+            if shards is None:
+                wanted = groups
+            else:
+                wanted = [s for s in shards if s[0] == classname]
+            for shard in wanted:
+                path = shard_file(FileStorage.__file_path, shard)
+                keys = groups.get(shard)
+                if keys:
+                    plan.append(("write", path, self.__records_text(keys)))
+                else:
+                    plan.append(("remove", path, None))
+        return plan
+
+    def __records_text(self, keys):
+        """
+            Returns the snapshot file content of the given keys' records,
+            encoding those not encoded yet
+        """
+        encoded = FileStorage.__encoded
+        pairs = []
+        for key in keys:
+            record = encoded.get(key)
+            if record is None:
+                record = encoded[key] = self.__encode(key)
+            pairs.append((key, record))
+        return self.serializer.join(pairs)
+
+    def __encode(self, key):
+        """Returns the encoding of the object, or raw record, of key"""
+        obj = FileStorage.__objects[key]
+        if key in FileStorage.__raw:
+            return self.serializer.encode(obj)
+        return self.serializer.encode_object(obj, self.epoch_timestamps)
+
+    def __saved_records(self):
+        """
+            Returns the encodings of the saved records by key, encoding the
+            unchanged objects whose encoding reload() did not keep
+        """
+        encoded = FileStorage.__encoded
+        for key in FileStorage.__objects:
+            if key not in encoded and key not in FileStorage.__dirty:
+                encoded[key] = self.__encode(key)
+        return encoded
+
+    def __encode_dirty(self):
+        """
+            refreshes the cached JSON of the dirty keys and returns them
+            with the encoded record, or None for deleted keys
+        """
+        changes = []
+        for key in FileStorage.__dirty:
+            obj = FileStorage.__objects.get(key)
+            if obj is None:
+                FileStorage.__encoded.pop(key, None)
+                changes.append((key, None))
+            else:
+                encoded = self.serializer.encode_object(
+                    obj, self.epoch_timestamps)
+                FileStorage.__encoded[key] = encoded
+                changes.append((key, encoded))
+        FileStorage.__dirty.clear()
+        return changes
+
+    def __replay_log(self, classname=None):
+        """
+            applies the journal log records in order, of classname only,
+            those of a log segment left by a compaction first
+        """
+        log = FileStorage.__file_path + ".log"
+        for path in (log + ".1", log):
+            self.__replay_segment(path, classname)
+
+    def __replay_segment(self, path, classname):
+        """applies the records of the log at path"""
+        for entry in read_log(path):
+            key = entry["key"]
+            if classname and key.split(".")[0] != classname:
+                continue
+            if entry["op"] == "put":
+                self.__put(key, entry["value"])
+                FileStorage.__encoded[key] = \
+                    self.serializer.encode(entry["value"])
+            else:
+                self.__remove(key)
+                FileStorage.__encoded.pop(key, None)
+                FileStorage.__dirty.discard(key)
@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+"""
+    files module: reading, writing and naming the files of FileStorage
+"""
+import glob
+import gzip
+import io
+import lzma
+import os
+import zlib
+from models.base_model import registry
+
+COMPRESSORS = {
+    "gzip": lambda data, level: gzip.compress(
+        data, 9 if level is None else level),
+    "zlib": lambda data, level: zlib.compress(
+        data, -1 if level is None else level),
+    "lzma": lambda data, level: lzma.compress(data, preset=level),
+}
+
+
+class _ZlibReader(io.RawIOBase):
+    """binary stream inflating a zlib compressed file as it is read"""
+
+    def __init__(self, f):
+        """f: the compressed file, opened in binary mode"""
+        self.__file = f
+        self.__inflate = zlib.decompressobj()
+        self.__pending = b""
+
+    def readable(self):
+        """the stream can be read"""
+        return True
+
+    def readinto(self, b):
+        """fills b with the next decompressed bytes"""
+        while not self.__pending:
+            data = self.__inflate.unconsumed_tail or self.__file.read(1 << 16)
+            if not data:
+                self.__pending = self.__inflate.flush()
+                if not self.__pending:
+                    return 0
+                break
+            self.__pending = self.__inflate.decompress(data, 1 << 16)
+        size = min(len(b), len(self.__pending))
+        b[:size] = self.__pending[:size]
+        self.__pending = self.__pending[size:]
+        return size
+
+    def close(self):
+        """closes the compressed file too"""
+        self.__file.close()
+        super().close()
+
+
+def open_snapshot(path):
+    """
+        Opens a snapshot file for reading as bytes, decompressing it on
+        the fly when it starts with a gzip, xz or zlib header
+    """
+    f = open(path, "rb")
+    head = f.read(6)
+    if head[:2] == b"\x1f\x8b":
+        f.close()
+        return gzip.open(path, "rb")
+    if head == b"\xfd7zXZ\x00":
+        f.close()
+        return lzma.open(path, "rb")
+    f.seek(0)
+    if len(head) > 1 and head[0] & 0x0f == 8 and \
+            (head[0] << 8 | head[1]) % 31 == 0:
+        return io.BufferedReader(_ZlibReader(f))
+    return f
+
+
+def write_file(path, text, mode="w", compression=None, level=None,
+               fsync=False):
+    """
+        writes text (or bytes) to path, compressed with compression at
+        level unless appended, and fsync'ed if asked
+    """
+    if mode == "w" and compression:
+        if isinstance(text, str):
+            text = text.encode("utf-8")
+        text = COMPRESSORS[compression](text, level)
+    if isinstance(text, bytes):
+        mode += "b"
+    with open(path, mode) as f:
+        f.write(text)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def install(tmp, path, fsync=False):
+    """renames the written file tmp over path"""
+    os.replace(tmp, path)
+    if fsync:
+        fsync_dir(path)
+
+
+def fsync_dir(path):
+    """flushes the directory entry of path, where the platform allows it"""
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def signature(path):
+    """Returns what tells whether the file at path changed, or None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def sizes(paths):
+    """Returns the total size of the existing files among paths"""
+    total = 0
+    for path in paths:
+        found = signature(path)
+        if found is not None:
+            total += found[1]
+    return total
+
+
+def shard_of(key, shards):
+    """Returns the (class name, bucket) of the shard holding key"""
+    classname, obj_id = key.split(".", 1)
+    if shards == 1:
+        return classname, None
+    return classname, zlib.crc32(obj_id.encode()) % shards
+
+
+def shard_file(path, shard):
+    """Returns the file of the (class name, bucket) shard of path"""
+    root = os.path.splitext(path)[0]
+    classname, bucket = shard
+    if bucket is None:
+        return "{}.{}.json".format(root, classname)
+    return "{}.{}.{}.json".format(root, classname, bucket)
+
+
+def shard_of_file(path, name):
+    """
+        Returns the (class name, bucket) shard whose file of path is name,
+        or None if shard_file() does not build that name
+    """
+    root = os.path.splitext(path)[0] + "."
+    if not name.startswith(root) or not name.endswith(".json"):
+        return None
+    parts = name[len(root):-len(".json")].split(".")
+    if parts[0] not in registry or len(parts) > 2:
+        return None
+    if len(parts) == 1:
+        return parts[0], None
+    if not parts[1].isdigit() or str(int(parts[1])) != parts[1]:
+        return None
+    return parts[0], int(parts[1])
+
+
+def shard_files(path, classname=None):
+    """Returns the existing shard files of path, of classname only"""
+    root = os.path.splitext(path)[0]
+    paths = []
+    for name in glob.glob(glob.escape(root) + ".*.json"):
+        shard = shard_of_file(path, name)
+        if shard is not None and classname in (None, shard[0]):
+            paths.append(name)
+    return sorted(paths)
@@ -0,0 +1,520 @@
+#!/usr/bin/python3
+"""
+    indexes module: the secondary indexes FileStorage keeps on model
+    attributes
+"""
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+
+class HashIndex:
+    """
+        The HashIndex class maps every hashable value of one attribute to
+        the keys of the objects holding it
+    """
+    kind = "hash"
+    ops = ("eq", "in")
+
+    def __init__(self, attr):
+        """attr: the name of the indexed attribute"""
+        self.attr = attr
+        self.attrs = (attr,)
+        self.keys_by_value = {}
+
+    def add(self, value, key):
+        """adds key under value"""
+        try:
+            self.keys_by_value.setdefault(value, set()).add(key)
+        except TypeError:
+            pass
+
+    def remove(self, value, key):
+        """removes key from under value"""
+        try:
+            keys = self.keys_by_value.get(value)
+        except TypeError:
+            return
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_value[value]
+
+    def keys(self, op, value):
+        """Returns the keys whose value matches op and value"""
+        if op == "eq":
+            try:
+                return list(self.keys_by_value.get(value, ()))
+            except TypeError:
+                return []
+        if op == "in":
+            keys = []
+            for val in _distinct(value):
+                keys.extend(self.keys("eq", val))
+            return keys
+        return None
+
+    def estimate(self, op, value):
+        """Returns the number of keys keys(op, value) returns"""
+        if op == "eq":
+            try:
+                return len(self.keys_by_value.get(value, ()))
+            except TypeError:
+                return 0
+        if op == "in":
+            return sum(self.estimate("eq", val) for val in _distinct(value))
+        return None
+
+
+def _distinct(values):
+    """Returns the hashable values once each, in their order"""
+    distinct = {}
+    for value in values:
+        try:
+            distinct.setdefault(value, None)
+        except TypeError:
+            pass
+    return list(distinct)
+
+
+class SortedIndex:
+    """
+        The SortedIndex class keeps the keys ordered by the numeric value
+        of one attribute; changes are merged in, sorted, at the next read
+    """
+    kind = "sorted"
+    ops = ("eq", "lt", "lte", "gt", "gte", "range", "order")
+
+    def __init__(self, attr):
+        """attr: the name of the indexed attribute"""
+        self.attr = attr
+        self.attrs = (attr,)
+        self.values = []
+        self.keys_in_order = []
+        self.others = set()
+        self.added = {}
+        self.removed = {}
+        self.__lock = threading.Lock()
+
+    def add(self, value, key):
+        """adds key at value"""
+        if not _is_number(value):
+            self.others.add(key)
+        elif key in self.removed and self.removed[key] == value:
+            del self.removed[key]
+        else:
+            self.added[key] = value
+
+    def remove(self, value, key):
+        """removes key from value"""
+        if not _is_number(value):
+            self.others.discard(key)
+        elif key in self.added and self.added[key] == value:
+            del self.added[key]
+        else:
+            self.removed[key] = value
+
+    def __settle(self):
+        """merges the waiting changes into the ordered lists"""
+        if not (self.added or self.removed):
+            return
+        with self.__lock:
+            if not (self.added or self.removed):
+                return
+            if len(self.removed) < _FEW:
+                for key, value in self.removed.items():
+                    self.__delete(value, key)
+            elif self.removed:
+                removed = self.removed
+                pairs = [(value, key) for value, key in zip(
+                    self.values, self.keys_in_order)
+                    if key not in removed or removed[key] != value]
+                self.values = [value for value, key in pairs]
+                self.keys_in_order = [key for value, key in pairs]
+            pairs = sorted((value, key) for key, value in self.added.items())
+            if len(pairs) < _FEW:
+                for value, key in pairs:
+                    self.__insert(value, key)
+            else:
+                pairs = list(heapq.merge(
+                    zip(self.values, self.keys_in_order), pairs))
+                self.values = [value for value, key in pairs]
+                self.keys_in_order = [key for value, key in pairs]
+            # emptied last: a reader finding nothing waiting reads the lists
+            self.added = {}
+            self.removed = {}
+
+    def __insert(self, value, key):
+        """inserts key at value in the ordered lists"""
+        lo = bisect_left(self.values, value)
+        hi = bisect_right(self.values, value, lo)
+        i = bisect_left(self.keys_in_order, key, lo, hi)
+        self.values.insert(i, value)
+        self.keys_in_order.insert(i, key)
+
+    def __delete(self, value, key):
+        """deletes key at value from the ordered lists"""
+        lo = bisect_left(self.values, value)
+        hi = bisect_right(self.values, value, lo)
+        i = bisect_left(self.keys_in_order, key, lo, hi)
+        if i < hi and self.keys_in_order[i] == key:
+            del self.values[i]
+            del self.keys_in_order[i]
+
+    def keys(self, op, value, descending=False):
+        """
+            Returns the keys whose value matches op and value in ascending
+            order, or descending; op "order" returns every key
+        """
+        self.__settle()
+        if op == "order":
+            if descending:
+                return self.keys_in_order[::-1] + sorted(self.others)
+            return self.keys_in_order + sorted(self.others)
+        bounds = self.__bounds(op, value)
+        if bounds is None:
+            return None
+        keys = self.keys_in_order[bounds[0]:bounds[1]]
+        return keys[::-1] if descending else keys
+
+    def estimate(self, op, value):
+        """Returns the number of keys keys(op, value) returns"""
+        self.__settle()
+        if op == "order":
+            return len(self.keys_in_order) + len(self.others)
+        bounds = self.__bounds(op, value)
+        if bounds is None:
+            return None
+        return max(bounds[1] - bounds[0], 0)
+
+    def __bounds(self, op, value):
+        """Returns the slice of values matching op and value, or None"""
+        if op == "range":
+            low, high = value
+            if not (_is_number(low) and _is_number(high)):
+                return None
+            return (bisect_left(self.values, low),
+                    bisect_right(self.values, high))
+        if not _is_number(value):
+            return None
+        if op == "eq":
+            return (bisect_left(self.values, value),
+                    bisect_right(self.values, value))
+        if op == "lt":
+            return 0, bisect_left(self.values, value)
+        if op == "lte":
+            return 0, bisect_right(self.values, value)
+        if op == "gt":
+            return bisect_right(self.values, value), len(self.values)
+        if op == "gte":
+            return bisect_left(self.values, value), len(self.values)
+        return None
+
+
+# below this many waiting changes a read inserts them one by one
+_FEW = 16
+
+
+def _is_number(value):
+    """Returns True for the int and float values a SortedIndex orders"""
+    return type(value) in (int, float, bool) and value == value
+
+
+class GeoIndex:
+    """
+        The GeoIndex class buckets the keys by the grid cell of their
+        (latitude, longitude) to find those near a point
+    """
+    kind = "geo"
+    ops = ()
+
+    def __init__(self, attrs, cell=0.1):
+        """
+            attrs: the names of the latitude and longitude attributes
+            cell: the side of a grid cell in degrees
+        """
+        self.attrs = tuple(attrs)
+        self.attr = ",".join(self.attrs)
+        self.cell = cell
+        self.rows = math.ceil(180 / cell)
+        self.cols = math.ceil(360 / cell)
+        self.cells = {}
+        self.positions = {}
+
+    def add(self, value, key):
+        """adds key at value, a (latitude, longitude) pair"""
+        lat, lon = value
+        if not (_is_number(lat) and _is_number(lon)) or \
+                not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return
+        self.positions[key] = (lat, lon)
+        self.cells.setdefault(self.__cell(lat, lon), set()).add(key)
+
+    def remove(self, value, key):
+        """removes key, wherever it is"""
+        pos = self.positions.pop(key, None)
+        if pos is None:
+            return
+        cell = self.__cell(*pos)
+        keys = self.cells[cell]
+        keys.discard(key)
+        if not keys:
+            del self.cells[cell]
+
+    def keys(self, op, value):
+        """Returns None: queries reach this index through near()"""
+        return None
+
+    def estimate(self, op, value):
+        """Returns None: queries reach this index through near()"""
+        return None
+
+    def near(self, lat, lon, km):
+        """
+            Returns the (distance, key) pairs of the keys within km of
+            (lat, lon), nearest first
+        """
+        span = math.degrees(km / _EARTH_KM)
+        south, north = lat - span, lat + span
+        rows = range(max(self.__row(south), 0),
+                     min(self.__row(north), self.rows - 1) + 1)
+        cols = None
+        if -90 < south and north < 90:
+            # the widest longitude gap of the circle, at its centre
+            reach = math.sin(km / _EARTH_KM) / math.cos(math.radians(lat))
+            if reach < 1:
+                cols = self.__cols(lon, math.degrees(math.asin(reach)))
+        if cols is None or len(rows) * len(cols) > len(self.cells):
+            candidates = self.positions
+        else:
+            candidates = [
+                key for row in rows for col in cols
+                for key in self.cells.get((row, col), ())
+            ]
+        found = []
+        for key in candidates:
+            dist = _distance(lat, lon, *self.positions[key])
+            if dist <= km:
+                found.append((dist, key))
+        found.sort()
+        return found
+
+    def nearest(self, lat, lon, k):
+        """
+            Returns the (distance, key) pairs of the k keys nearest to
+            (lat, lon), nearest first
+        """
+        if k <= 0:
+            return []
+        row, col = self.__cell(lat, lon)
+        best = []
+        ring = 0
+        while True:
+            if 8 * ring > len(self.cells):
+                # the ring would visit more cells than are populated
+                found = [(_distance(lat, lon, *pos), key)
+                         for key, pos in self.positions.items()]
+                return heapq.nsmallest(k, found)
+            for cell in self.__ring(row, col, ring):
+                for key in self.cells.get(cell, ()):
+                    dist = _distance(lat, lon, *self.positions[key])
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, key))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, key))
+            if len(best) == k and \
+                    -best[0][0] <= self.__outside(lat, lon, row, col, ring):
+                break
+            ring += 1
+        return sorted((-dist, key) for dist, key in best)
+
+    def __row(self, lat):
+        """Returns the grid row of lat"""
+        return int((lat + 90) // self.cell)
+
+    def __cell(self, lat, lon):
+        """Returns the (row, column) of the cell holding lat, lon"""
+        return (min(self.__row(lat), self.rows - 1),
+                int((lon + 180) // self.cell) % self.cols)
+
+    def __cols(self, lon, span):
+        """Returns the columns within span degrees of lon, or None"""
+        if span >= 180:
+            return None
+        first = int((lon - span + 180) // self.cell)
+        last = int((lon + span + 180) // self.cell)
+        return [col % self.cols for col in range(first, last + 1)]
+
+    def __ring(self, row, col, ring):
+        """
+            yields once each the cells at ring cells from (row, col), the
+            columns wrapping around
+        """
+        if 2 * ring + 1 >= self.cols:
+            full = range(self.cols)
+        else:
+            full = [c % self.cols for c in range(col - ring, col + ring + 1)]
+        edges = ()
+        if 2 * ring <= self.cols:
+            edges = sorted({(col - ring) % self.cols,
+                            (col + ring) % self.cols})
+        for r in range(row - ring, row + ring + 1):
+            if 0 <= r < self.rows:
+                for c in full if abs(r - row) == ring else edges:
+                    yield r, c
+
+    def __outside(self, lat, lon, row, col, ring):
+        """
+            Returns a lower bound of the distance from (lat, lon) to any
+            point outside the square of cells ring cells around (row, col)
+        """
+        south = (row - ring) * self.cell - 90
+        north = (row + ring + 1) * self.cell - 90
+        gap = min(lat - south if south > -90 else 180,
+                  north - lat if north < 90 else 180)
+        bound = _EARTH_KM * math.radians(gap)
+        lon = (lon + 180) % 360 - 180
+        if (2 * ring + 1) < self.cols:
+            west = (col - ring) * self.cell - 180
+            east = (col + ring + 1) * self.cell - 180
+            turn = math.radians(min(lon - west, east - lon, 90))
+            bound = min(bound, _EARTH_KM * math.asin(
+                min(1.0, math.sin(turn) * math.cos(math.radians(lat)))))
+        return bound
+
+
+_EARTH_KM = 6371.0088
+
+
+def _distance(lat1, lon1, lat2, lon2):
+    """Returns the great-circle distance in km between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * _EARTH_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class TextIndex:
+    """
+        The TextIndex class is an inverted index over the words of one or
+        more text attributes: postings maps every word to the term
+        frequency of each key holding it. search() ranks the keys holding
+        any of the words of a request by BM25.
+    """
+    kind = "text"
+    ops = ()
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, attrs):
+        """attrs: the names of the indexed attributes"""
+        self.attrs = tuple(attrs)
+        self.attr = ",".join(self.attrs)
+        self.postings = {}
+        self.lengths = {}
+        self.total = 0
+
+    def add(self, value, key):
+        """indexes the words of value, a text or a tuple of texts"""
+        counts = Counter(tokenize(value))
+        if not counts:
+            return
+        self.lengths[key] = sum(counts.values())
+        self.total += self.lengths[key]
+        for word, freq in counts.items():
+            self.postings.setdefault(word, {})[key] = freq
+
+    def remove(self, value, key):
+        """forgets the words of value for key"""
+        length = self.lengths.pop(key, None)
+        if length is None:
+            return
+        self.total -= length
+        for word in set(tokenize(value)):
+            keys = self.postings.get(word)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self.postings[word]
+
+    def keys(self, op, value):
+        """Returns None: queries reach this index through search()"""
+        return None
+
+    def estimate(self, op, value):
+        """Returns None: queries reach this index through search()"""
+        return None
+
+    def search(self, text, limit=None):
+        """
+            Returns the (score, key) pairs of the keys holding words of
+            text, best first
+        """
+        if not self.lengths:
+            return []
+        count = len(self.lengths)
+        average = self.total / count
+        scores = {}
+        for word in set(tokenize(text)):
+            keys = self.postings.get(word)
+            if not keys:
+                continue
+            idf = math.log(1 + (count - len(keys) + 0.5) / (len(keys) + 0.5))
+            for key, freq in keys.items():
+                norm = self.k1 * (1 - self.b +
+                                  self.b * self.lengths[key] / average)
+                scores[key] = scores.get(key, 0) + \
+                    idf * freq * (self.k1 + 1) / (freq + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(score, key) for key, score in ranked[:limit]]
+
+
+def tokenize(value):
+    """Returns the lowercase words of value, a text or a tuple of texts"""
+    texts = value if isinstance(value, tuple) else (value,)
+    return [word for text in texts if isinstance(text, str)
+            for word in _WORD.findall(text.casefold())]
+
+
+def text_attrs(cls):
+    """
+        Returns the attributes of cls full-text searches read: the ones
+        listed in its _text_indexes, or else its text class attributes
+        other than foreign keys
+    """
+    attrs = getattr(cls, "_text_indexes", None)
+    if attrs:
+        return tuple(attrs)
+    return tuple(
+        name for name in dir(cls)
+        if not name.startswith("_") and not name.endswith("_id") and
+        type(getattr(cls, name)) is str
+    )
+
+
+_WORD = re.compile(r"\w+")
+
+
+def indexes_for(cls):
+    """
+        Returns new indexes, by attribute name, on the attributes cls
+        lists in _hash_indexes, _sorted_indexes, _geo_index and
+        _text_indexes
+    """
+    indexes = {}
+    for attr in getattr(cls, "_hash_indexes", ()):
+        indexes[attr] = HashIndex(attr)
+    for attr in getattr(cls, "_sorted_indexes", ()):
+        indexes[attr] = SortedIndex(attr)
+    if getattr(cls, "_geo_index", None):
+        index = GeoIndex(cls._geo_index)
+        indexes[index.attr] = index
+    if getattr(cls, "_text_indexes", None):
+        index = TextIndex(cls._text_indexes)
+        indexes[index.attr] = index
+    return indexes
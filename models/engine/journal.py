@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+"""
+    journal module: the append-only log of the journaled FileStorage,
+    JSON lines of {"op": "put" or "delete", "key", "value"}
+"""
+import json
+import os
+import shutil
+from models.engine.files import signature
+
+
+def log_text(changes, to_json):
+    """
+        Returns the log lines recording the (key, encoding) changes, None
+        for a deleted key; to_json gives the JSON of an encoding
+    """
+    lines = []
+    for key, encoded in changes:
+        if encoded is None:
+            entry = json.dumps({"op": "delete", "key": key})
+        else:
+            entry = '{{"op": "put", "key": {}, "value": {}}}'.format(
+                json.dumps(key), to_json(encoded))
+        lines.append(entry + "\n")
+    return "".join(lines)
+
+
+def read_log(path, offset=0):
+    """
+        yields the records of the complete lines of the log at path past
+        offset, up to any line an interrupted append left
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                return
+            yield entry
+
+
+def trim_torn_tail(path):
+    """
+        truncates the log at path after its last complete line, so the
+        next record does not merge into what an interrupted append left
+    """
+    try:
+        f = open(path, "rb+")
+    except FileNotFoundError:
+        return
+    with f:
+        pos = f.seek(0, os.SEEK_END)
+        if pos == 0:
+            return
+        f.seek(pos - 1)
+        if f.read(1) == b"\n":
+            return
+        while pos > 0:
+            step = min(pos, 1 << 16)
+            pos -= step
+            f.seek(pos)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(pos + newline + 1)
+                return
+        f.truncate(0)
+
+
+def rotate(log):
+    """
+        moves the log to the segment <log>.1 a compaction folds in, after
+        the records of one an interrupted compaction left; Returns its path
+    """
+    frozen = log + ".1"
+    if os.path.exists(log) and os.path.exists(frozen):
+        trim_torn_tail(frozen)
+        with open(log, "rb") as src, open(frozen, "ab") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(log)
+    elif os.path.exists(log):
+        os.replace(log, frozen)
+    return frozen
+
+
+def segments(log, old, offset, rewritten):
+    """
+        Returns the (path, offset) log segments holding the records added
+        since the log had signature old and was read up to offset;
+        rewritten tells whether a snapshot file changed meanwhile
+    """
+    frozen = signature(log + ".1")
+    new = signature(log)
+    if not rewritten and old is not None and frozen is not None and \
+            frozen[0] == old[0]:
+        # a compaction renamed the log being read: finish it first
+        return [(log + ".1", offset), (log, 0)]
+    if rewritten or new is None or old is None or new[0] != old[0] or \
+            new[1] < offset:
+        # the log was replaced, read it all again
+        return [(log + ".1", 0), (log, 0)]
+    return [(log, offset)]
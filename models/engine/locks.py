@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+"""
+    locks module: the reader/writer lock of the thread-safe storage and
+    the lock file of the shared one
+"""
+from contextlib import contextmanager
+import threading
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class _Side:
+    """context manager taking one side of an RWLock"""
+
+    def __init__(self, acquire, release):
+        """acquire, release: the methods taking and leaving that side"""
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class RWLock:
+    """
+        The RWLock class lets any number of threads read at once, or one
+        write alone; both sides are reentrant and writers are not starved
+    """
+
+    def __init__(self):
+        self.__cond = threading.Condition(threading.Lock())
+        self.__readers = {}
+        self.__writer = None
+        self.__depth = 0
+        self.__waiting = 0
+        self.reading = _Side(self.acquire_read, self.release_read)
+        self.writing = _Side(self.acquire_write, self.release_write)
+
+    def acquire_read(self):
+        """waits until the thread may read"""
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer != me and me not in self.__readers:
+                while self.__writer is not None or self.__waiting:
+                    self.__cond.wait()
+            self.__readers[me] = self.__readers.get(me, 0) + 1
+
+    def release_read(self):
+        """ends a read of the thread"""
+        me = threading.get_ident()
+        with self.__cond:
+            depth = self.__readers[me] - 1
+            if depth:
+                self.__readers[me] = depth
+            else:
+                del self.__readers[me]
+                self.__cond.notify_all()
+
+    def acquire_write(self):
+        """waits until the thread may write; raises if it is reading"""
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__writer == me:
+                self.__depth += 1
+                return
+            if me in self.__readers:
+                raise RuntimeError("cannot write while reading")
+            self.__waiting += 1
+            try:
+                while self.__writer is not None or self.__readers:
+                    self.__cond.wait()
+            finally:
+                self.__waiting -= 1
+            self.__writer = me
+            self.__depth = 1
+
+    def release_write(self):
+        """ends a write of the thread"""
+        with self.__cond:
+            if self.__writer != threading.get_ident():
+                raise RuntimeError("the write lock is not held")
+            self.__depth -= 1
+            if not self.__depth:
+                self.__writer = None
+                self.__cond.notify_all()
+
+
+class LockFile:
+    """
+        The LockFile class is the file processes sharing a storage flock
+        around their saves and reloads; it holds the generation number
+        counting their saves
+    """
+
+    def __init__(self, path):
+        """path: the lock file"""
+        self.path = path
+
+    @contextmanager
+    def held(self, exclusive):
+        """holds the lock, exclusive or shared, giving the open file"""
+        with open(self.path, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(),
+                            fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield f
+
+    @staticmethod
+    def generation(f):
+        """Returns the generation number kept in the held file f"""
+        f.seek(0)
+        text = f.read().strip()
+        return int(text) if text.isdigit() else 0
+
+    @staticmethod
+    def set_generation(f, generation):
+        """writes the generation number in the held file f"""
+        f.seek(0)
+        f.truncate()
+        f.write(str(generation))
+        f.flush()
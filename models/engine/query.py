@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+"""
+    query module: the query builder returned by storage.query()
+"""
+from itertools import islice
+from models.engine.indexes import _is_number
+
+_OPS = {
+    "eq": lambda val, arg: val == arg,
+    "ne": lambda val, arg: val != arg,
+    "lt": lambda val, arg: val < arg,
+    "lte": lambda val, arg: val <= arg,
+    "gt": lambda val, arg: val > arg,
+    "gte": lambda val, arg: val >= arg,
+    "in": lambda val, arg: val in arg,
+    "contains": lambda val, arg: arg in val,
+    "range": lambda val, arg: arg[0] <= val <= arg[1],
+}
+
+
+def _sort_key(val, descending=False):
+    """
+        Returns a sort key putting the numbers first and None last in both
+        directions, as a SortedIndex does, other values grouped by type
+    """
+    if _is_number(val):
+        rank, kind = 0, ""
+    elif val is None:
+        rank, kind = 2, ""
+    else:
+        rank, kind = 1, type(val).__name__
+    return -rank if descending else rank, kind, val
+
+
+class Query:
+    """
+        The Query class selects the objects of one class, read from the
+        index narrowing the search the most:
+            storage.query(Place).where(price_by_night__lt=100).limit(10)
+    """
+
+    def __init__(self, storage, cls):
+        """
+            storage: the engine holding the objects
+            cls: the class queried, or its name
+        """
+        self.storage = storage
+        self.classname = cls if isinstance(cls, str) else cls.__name__
+        self.conditions = []
+        self.ordering = []
+        self.max_rows = None
+        self.scanned = 0
+
+    def where(self, **conditions):
+        """
+            adds conditions the selected objects must all meet, each
+            <attribute>__<operator>=<value> with the operator one of eq
+            (the default), ne, lt, lte, gt, gte, in, contains or range
+        """
+        for name, value in conditions.items():
+            attr, _, op = name.partition("__")
+            op = op or "eq"
+            if op not in _OPS:
+                raise ValueError("unknown operator: {}".format(op))
+            self.conditions.append((attr, op, value))
+        return self
+
+    def order_by(self, *attrs):
+        """sorts the objects by attrs, descending for names led by -"""
+        self.ordering.extend(attrs)
+        return self
+
+    def limit(self, n):
+        """stops after n objects"""
+        self.max_rows = n
+        return self
+
+    def plan(self):
+        """
+            Returns the access path as (index, attr, op, value, estimated
+            rows), index being None for a scan of the class
+        """
+        with self.storage.reading:
+            best = (None, None, None, None,
+                    self.storage.count(self.classname))
+            indexes = self.storage.indexes(self.classname)
+            if len(self.ordering) == 1:
+                index = indexes.get(self.ordering[0].lstrip("-"))
+                if index is not None and "order" in index.ops:
+                    best = (index, index.attr, "order", None,
+                            index.estimate("order", None))
+            for attr, op, value in self.conditions:
+                index = indexes.get(attr)
+                if index is None or op not in index.ops:
+                    continue
+                estimate = index.estimate(op, value)
+                if estimate is not None and estimate < best[-1]:
+                    best = (index, attr, op, value, estimate)
+            return best
+
+    def __iter__(self):
+        """yields the selected objects"""
+        plan = self.plan()
+        ordered = self.__ordered(plan[0])
+        rows = self.__candidates(plan, ordered)
+        rows = (obj for obj in rows if self.__matches(obj))
+        if self.ordering and not ordered:
+            rows = iter(self.__sorted(rows))
+        if self.max_rows is not None:
+            rows = islice(rows, self.max_rows)
+        yield from rows
+
+    def all(self):
+        """Returns the list of the selected objects"""
+        return list(self)
+
+    def first(self):
+        """Returns the first selected object, or None"""
+        return next(iter(self), None)
+
+    def explain(self):
+        """
+            Runs the query and returns a dictionary with its plan (a list
+            of steps), the number of objects it scanned and the number it
+            returned
+        """
+        index, attr, op, value, estimate = self.plan()
+        if index is None:
+            steps = ["SCAN {} (~{} rows)".format(self.classname, estimate)]
+        else:
+            steps = ["{} INDEX {}.{} {} {!r} (~{} rows)".format(
+                index.kind.upper(), self.classname, attr, op, value,
+                estimate)]
+        for cond in self.conditions:
+            steps.append("FILTER {} {} {!r}".format(*cond))
+        if self.__ordered(index):
+            steps.append("ORDER BY INDEX {}".format(self.ordering[0]))
+        elif self.ordering:
+            steps.append("SORT {}".format(", ".join(self.ordering)))
+        if self.max_rows is not None:
+            steps.append("LIMIT {}".format(self.max_rows))
+        returned = sum(1 for obj in self)
+        return {"plan": steps, "scanned": self.scanned, "returned": returned}
+
+    def __ordered(self, index):
+        """Returns True if index gives the objects in the asked order"""
+        return (index is not None and index.kind == "sorted" and
+                len(self.ordering) == 1 and
+                self.ordering[0].lstrip("-") == index.attr)
+
+    def __candidates(self, plan, ordered):
+        """yields the objects read through the planned access path"""
+        self.scanned = 0
+        index, attr, op, value, estimate = plan
+        if index is None:
+            for obj in self.storage.all(self.classname).values():
+                self.scanned += 1
+                yield obj
+            return
+        with self.storage.reading:
+            if ordered:
+                keys = index.keys(
+                    op, value, descending=self.ordering[0].startswith("-"))
+            else:
+                keys = index.keys(op, value)
+        for key in keys:
+            obj = self.storage.get(self.classname, key.split(".", 1)[1])
+            if obj is not None:
+                self.scanned += 1
+                yield obj
+
+    def __matches(self, obj):
+        """Returns True if obj meets every condition"""
+        for attr, op, value in self.conditions:
+            try:
+                if not _OPS[op](getattr(obj, attr, None), value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def __sorted(self, rows):
+        """Returns rows sorted as order_by() asked"""
+        rows = list(rows)
+        for attr in reversed(self.ordering):
+            name = attr.lstrip("-")
+            desc = attr.startswith("-")
+            rows.sort(key=lambda obj: _sort_key(getattr(obj, name, None),
+                                                desc), reverse=desc)
+        return rows
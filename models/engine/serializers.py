@@ -0,0 +1,487 @@
+#!/usr/bin/python3
+"""
+    serializers module: the formats FileStorage writes its snapshot files
+    in, one record at a time
+"""
+import io
+import json
+import marshal
+import struct
+from datetime import datetime, timedelta
+from operator import itemgetter
+from models.base_model import EPOCH, registry
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_items(f, chunk_size=1 << 16, head=""):
+    """
+        Parses the top-level JSON object in file f incrementally and yields
+        (key, value, text) for each member, text being the raw JSON of the
+        value, so only one record has to be held in memory at a time;
+        head is the text already read from f
+    """
+    buf = head + f.read(chunk_size)
+    pos = 0
+    expect = "{"
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buf):
+            more = f.read(chunk_size)
+            if not more:
+                raise json.JSONDecodeError("Unexpected end of data", buf, pos)
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        if expect == "{":
+            if buf[pos] != "{":
+                raise json.JSONDecodeError("Expecting '{'", buf, pos)
+            pos += 1
+            expect = "key"
+            continue
+        if buf[pos] == "}" and expect in ("key", ","):
+            return
+        if expect == ",":
+            if buf[pos] != ",":
+                raise json.JSONDecodeError("Expecting ','", buf, pos)
+            pos += 1
+            expect = "key"
+            continue
+        try:
+            key, end = _decoder.raw_decode(buf, pos)
+            colon = end
+            while colon < len(buf) and buf[colon] in _WHITESPACE:
+                colon += 1
+            if colon == len(buf):
+                raise json.JSONDecodeError("Unexpected end of data", buf, end)
+            if buf[colon] != ":":
+                raise json.JSONDecodeError("Expecting ':'", buf, colon)
+            start = colon + 1
+            while start < len(buf) and buf[start] in _WHITESPACE:
+                start += 1
+            value, end = _decoder.raw_decode(buf, start)
+            if end == len(buf):
+                raise json.JSONDecodeError("Unexpected end of data", buf, end)
+        except json.JSONDecodeError:
+            # the member may just be cut by the chunk boundary
+            more = f.read(chunk_size)
+            if not more:
+                raise
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield key, value, buf[start:end]
+        pos = end
+        expect = ","
+
+
+_FRAME = struct.Struct("<II")
+_BITMAPS = struct.Struct("<QQ")
+_MISSING = object()
+
+
+def iter_frames(f, chunk_size=1 << 16, head=b""):
+    """
+        Yields (key, payload) for each frame of binary file f, a frame
+        being the byte lengths of both then the UTF-8 key and the payload;
+        head is the data already read from f
+    """
+    buf = head + f.read(chunk_size)
+    pos = 0
+    while True:
+        end = pos + _FRAME.size
+        if end <= len(buf):
+            key_size, size = _FRAME.unpack_from(buf, pos)
+            end += key_size + size
+        if end > len(buf):
+            more = f.read(max(chunk_size, end - len(buf)))
+            if not more:
+                if pos == len(buf):
+                    return
+                raise ValueError("truncated snapshot frame")
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        start = pos + _FRAME.size + key_size
+        yield buf[pos + _FRAME.size:start].decode("utf-8"), buf[start:end]
+        pos = end
+
+
+def _frame(key, payload):
+    """Returns the frame of payload under key"""
+    key = key.encode("utf-8")
+    return _FRAME.pack(len(key), len(payload)) + key + payload
+
+
+class JSONSerializer:
+    """
+        The JSONSerializer class writes the snapshot as one JSON object
+        mapping every key to its record, the historical format
+    """
+    name = "json"
+    magic = None
+
+    @staticmethod
+    def encode(record):
+        """Returns the encoding of record"""
+        return json.dumps(record)
+
+    def encode_object(self, obj, epoch=False):
+        """Returns the encoding of obj.to_dict(epoch=epoch)"""
+        return self.encode(obj.to_dict(epoch=epoch))
+
+    @staticmethod
+    def decode(encoded):
+        """Returns the record of an encoding"""
+        return json.loads(encoded)
+
+    @staticmethod
+    def to_json(encoded):
+        """Returns the JSON text of an encoding"""
+        return encoded
+
+    def join(self, pairs):
+        """Returns the file content holding the (key, encoding) pairs"""
+        return "{" + ", ".join(
+            json.dumps(key) + ": " + encoded for key, encoded in pairs) + "}"
+
+    def records(self, f, head=b""):
+        """
+            yields (key, record, encoding) for the records of binary file
+            f, head being its first bytes already read
+        """
+        text = io.TextIOWrapper(f, encoding="utf-8")
+        yield from iter_json_items(text, head=head.decode("utf-8"))
+
+
+class MarshalSerializer(JSONSerializer):
+    """
+        The MarshalSerializer class writes each record with the marshal
+        module, in frames following a magic line. Unlike pickle, reading
+        marshal data never runs code named by the file.
+    """
+    name = "marshal"
+    magic = b"HBNB-M1"
+
+    @staticmethod
+    def encode(record):
+        """Returns the encoding of record"""
+        return marshal.dumps(record)
+
+    @staticmethod
+    def decode(encoded):
+        """Returns the record of an encoding"""
+        return marshal.loads(encoded)
+
+    def to_json(self, encoded):
+        """Returns the JSON text of an encoding"""
+        return json.dumps(self.decode(encoded))
+
+    def join(self, pairs):
+        """Returns the file content holding the (key, encoding) pairs"""
+        return b"".join([self.magic] + [
+            _frame(key, encoded) for key, encoded in pairs])
+
+    def records(self, f, head=b""):
+        """yields (key, record, encoding) for the records of file f"""
+        for key, payload in iter_frames(f):
+            yield key, marshal.loads(payload), payload
+
+
+class BinarySerializer(MarshalSerializer):
+    """
+        The BinarySerializer class packs the id, timestamps and declared
+        str, int and float attributes of a record with one struct against
+        its class schema, which the first frame of the file records
+    """
+    name = "binary"
+    magic = b"HBNB-B1"
+    __schemas = {}
+    __layouts = {}
+    __packers = {}
+
+    def schema(self, classname):
+        """Returns the [(field, kind)] schema of classname"""
+        schema = self.__schemas.get(classname)
+        if schema is None:
+            schema = [("id", "s"), ("created_at", "t"), ("updated_at", "t")]
+            cls = registry.get(classname)
+            kinds = {str: "s", int: "q", float: "d"}
+            for name in sorted(dir(cls) if cls else ()):
+                val = getattr(cls, name)
+                if not name.startswith("_") and type(val) in kinds and \
+                        name not in ("id", "created_at", "updated_at"):
+                    schema.append((name, kinds[type(val)]))
+            schema = self.__schemas[classname] = schema[:64]
+        return schema
+
+    def encode(self, record, iso=False):
+        """
+            Returns the encoding of record; with iso, its integer
+            timestamps decode as ISO 8601 strings
+        """
+        classname = record["__class__"]
+        schema = self.schema(classname)
+        key = (classname, tuple(record), type(record.get("created_at")), iso)
+        packer = self.__packers.get(key)
+        if packer is None or packer.schema is not schema:
+            if len(self.__packers) >= 1024:
+                self.__packers.clear()
+            packer = self.__packers[key] = _Packer(
+                classname, schema, record, iso)
+        encoded = packer.pack(record)
+        if encoded is None:
+            encoded = self.__encode(record, classname, schema, iso)
+        return encoded
+
+    def encode_object(self, obj, epoch=False):
+        """
+            Returns the encoding of obj.to_dict(epoch=epoch), taking the
+            timestamps as integers either way so none is parsed
+        """
+        return self.encode(obj.to_dict(epoch=True), iso=not epoch)
+
+    @staticmethod
+    def __encode(record, classname, schema, iso=False):
+        """Returns the encoding of record, field by field"""
+        present = stamps = 0
+        fmt = ["<"]
+        values = []
+        strings = []
+        extra = {}
+        for i, (name, kind) in enumerate(schema):
+            val = record.get(name, _MISSING)
+            if val is _MISSING:
+                continue
+            field = _field(kind, val)
+            if field is None:
+                extra[name] = val
+                continue
+            code, val = field
+            if code == "I":
+                strings.append(val)
+                val = len(val)
+            elif kind == "t" and type(record[name]) is int and not iso:
+                stamps |= 1 << i
+            fmt.append(code)
+            values.append(val)
+            present |= 1 << i
+        names = {name for name, kind in schema}
+        for name, val in record.items():
+            if name not in names and name != "__class__":
+                extra[name] = val
+        head = classname.encode("utf-8")
+        return b"".join([
+            bytes((len(head),)), head, _BITMAPS.pack(present, stamps),
+            struct.pack("".join(fmt), *values), b"".join(strings),
+            json.dumps(extra).encode("utf-8") if extra else b""])
+
+    def decode(self, encoded, schema=None):
+        """Returns the record of an encoding, written with schema"""
+        size = encoded[0]
+        classname = encoded[1:1 + size].decode("utf-8")
+        present, stamps = _BITMAPS.unpack_from(encoded, 1 + size)
+        packed, names, texts, isos = self.__layout(
+            classname, schema, present, stamps)
+        values = list(packed.unpack_from(encoded, 17 + size))
+        pos = 17 + size + packed.size
+        for i in texts:
+            end = pos + values[i]
+            values[i] = encoded[pos:end].decode("utf-8")
+            pos = end
+        for i in isos:
+            values[i] = (EPOCH + timedelta(0, 0, values[i])).isoformat()
+        record = dict(zip(names, values))
+        if pos < len(encoded):
+            record.update(json.loads(encoded[pos:]))
+        record["__class__"] = classname
+        return record
+
+    def __layout(self, classname, schema, present, stamps):
+        """
+            Returns the struct of the packed fields of the records of
+            classname holding the present fields of schema, their names
+            and the positions of their strings and of their timestamps
+            to give as ISO 8601; those of the current schema are cached
+        """
+        current = self.schema(classname)
+        if schema is None:
+            schema = current
+        key = (classname, present, stamps)
+        layout = self.__layouts.get(key) if schema is current else None
+        if layout is None:
+            fields = [(name, kind, 1 << i)
+                      for i, (name, kind) in enumerate(schema)
+                      if present & 1 << i]
+            fmt = "<" + "".join({"s": "I", "d": "d"}.get(kind, "q")
+                                for name, kind, bit in fields)
+            layout = (
+                struct.Struct(fmt),
+                [name for name, kind, bit in fields],
+                [i for i, (name, kind, bit) in enumerate(fields)
+                 if kind == "s"],
+                [i for i, (name, kind, bit) in enumerate(fields)
+                 if kind == "t" and not stamps & bit])
+            if schema is current:
+                self.__layouts[key] = layout
+        return layout
+
+    def join(self, pairs):
+        """Returns the file content holding the (key, encoding) pairs"""
+        pairs = list(pairs)
+        names = sorted({key.split(".")[0] for key, encoded in pairs})
+        schemas = {name: self.schema(name) for name in names}
+        frames = [self.magic, _frame("", json.dumps(schemas).encode())]
+        frames.extend(_frame(key, encoded) for key, encoded in pairs)
+        return b"".join(frames)
+
+    def records(self, f, head=b""):
+        """yields (key, record, encoding) for the records of file f"""
+        frames = iter_frames(f)
+        schemas = {}
+        for key, payload in frames:
+            if not key:
+                schemas = {
+                    name: [tuple(field) for field in schema]
+                    for name, schema in json.loads(payload).items()}
+                continue
+            classname = key.split(".")[0]
+            schema = schemas.get(classname)
+            if schema is None or schema == self.schema(classname):
+                yield key, self.decode(payload), payload
+            else:
+                record = self.decode(payload, schema)
+                yield key, record, self.encode(record)
+
+
+class _Packer:
+    """
+        The _Packer class encodes for a BinarySerializer the records of
+        one class holding one set of attributes, all of the types the
+        record it was made from has
+    """
+
+    def __init__(self, classname, schema, record, iso=False):
+        """
+            schema: the schema of classname; record: a record of it
+            iso: whether integer timestamps decode as ISO 8601 strings
+        """
+        self.schema = schema
+        fields = [(i, name, kind) for i, (name, kind) in enumerate(schema)
+                  if name in record]
+        names = [name for i, name, kind in fields]
+        self.get = itemgetter(*names) if len(names) > 1 else \
+            lambda record: tuple(record[name] for name in names)
+        self.types = tuple(type(record[name]) for name in names)
+        known = {name for name, kind in schema}
+        self.extras = [name for name in record
+                       if name not in known and name != "__class__"]
+        self.texts = []
+        self.isos = []
+        present = stamps = 0
+        fmt = ["<"]
+        for j, (i, name, kind) in enumerate(fields):
+            field = _field(kind, record[name])
+            if field is None:
+                # a value not fitting its field: leave it to __encode
+                self.types = None
+                return
+            if field[0] == "I":
+                self.texts.append(j)
+            elif kind == "t" and type(record[name]) is str:
+                self.isos.append(j)
+            elif kind == "t" and not iso:
+                stamps |= 1 << i
+            fmt.append(field[0])
+            present |= 1 << i
+        head = classname.encode("utf-8")
+        self.head = bytes((len(head),)) + head + \
+            _BITMAPS.pack(present, stamps)
+        self.packed = struct.Struct("".join(fmt))
+
+    def pack(self, record):
+        """Returns the encoding of record, or None if it does not fit"""
+        values = list(self.get(record))
+        if tuple(map(type, values)) != self.types:
+            return None
+        for i in self.isos:
+            values[i] = _micros(values[i])
+            if values[i] is None:
+                return None
+        strings = []
+        for i in self.texts:
+            text = values[i].encode("utf-8")
+            strings.append(text)
+            values[i] = len(text)
+        try:
+            packed = self.packed.pack(*values)
+        except struct.error:
+            return None
+        if self.extras:
+            strings.append(json.dumps(
+                {name: record[name] for name in self.extras}).encode("utf-8"))
+        return b"".join([self.head, packed] + strings)
+
+
+def _field(kind, val):
+    """
+        Returns the struct code and packed value of val in a field of
+        kind, or None if it does not fit
+    """
+    if kind == "s":
+        return ("I", val.encode("utf-8")) if type(val) is str else None
+    if kind == "d":
+        return ("d", val) if type(val) is float else None
+    if type(val) is int:
+        return ("q", val) if -1 << 63 <= val < 1 << 63 else None
+    if kind == "t" and type(val) is str:
+        micros = _micros(val)
+        return None if micros is None else ("q", micros)
+    return None
+
+
+def _micros(val):
+    """
+        Returns the microseconds since EPOCH of val, a timestamp as
+        isoformat() writes them, or None
+    """
+    # the layout isoformat() gives a naive datetime, checked before the
+    # parse so no round trip through isoformat() is needed
+    if len(val) == 26:
+        if val[19] != "." or val.endswith("000000"):
+            return None
+    elif len(val) != 19:
+        return None
+    if val[4] != "-" or val[7] != "-" or val[10] != "T" or \
+            val[13] != ":" or val[16] != ":":
+        return None
+    try:
+        stamp = datetime.fromisoformat(val)
+    except ValueError:
+        return None
+    if stamp.tzinfo is not None:
+        return None
+    delta = stamp - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + \
+        delta.microseconds
+
+
+SERIALIZERS = {
+    serializer.name: serializer
+    for serializer in (JSONSerializer(), MarshalSerializer(),
+                       BinarySerializer())
+}
+
+
+def detect(f):
+    """
+        Returns the serializer of the snapshot in binary file f and the
+        bytes read from f to tell it
+    """
+    head = f.read(len(MarshalSerializer.magic))
+    for serializer in SERIALIZERS.values():
+        if serializer.magic == head:
+            return serializer, b""
+    return SERIALIZERS["json"], head
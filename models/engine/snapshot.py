@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+"""
+    snapshot module: the read views returned by storage.snapshot()
+"""
+from contextlib import nullcontext
+from models.base_model import registry
+
+
+def detached(obj):
+    """Returns a copy of obj, an instance or a raw record, no storage keeps"""
+    if isinstance(obj, dict):
+        return registry[obj["__class__"]](**obj)
+    copy = object.__new__(registry[type(obj).__name__])
+    copy.__dict__.update(
+        (name, type(val)(val) if type(val) in (list, dict, set) else val)
+        for name, val in obj._attributes().items())
+    return copy
+
+
+class Snapshot:
+    """
+        The Snapshot class gives the objects of a storage as they were
+        when it was taken; close it, or use it in a with statement
+    """
+
+    def __init__(self, objects, classes=None, release=None, reading=None):
+        """
+            objects: the objects by key, model instances or raw records
+            classes: the same by class name, if the storage has them
+            release: called with the snapshot when it is closed
+            reading: the storage's read lock, held while copies of
+                changed objects may be added to versions
+        """
+        self.objects = objects
+        self.classes = classes
+        self.versions = {}
+        self.release = release
+        self.reading = reading or nullcontext()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """ends the snapshot"""
+        if self.release is not None:
+            self.release(self)
+            self.release = None
+        self.objects = {}
+        self.classes = None
+        self.versions = {}
+
+    def all(self, cls=None):
+        """
+            Returns a dictionary of the objects, or of the objects of cls
+            (a class or a class name) only
+        """
+        if cls is None:
+            keys = self.objects
+        else:
+            name = cls if isinstance(cls, str) else cls.__name__
+            if self.classes is not None:
+                keys = self.classes.get(name, ())
+            else:
+                keys = [key for key in self.objects
+                        if key.split(".")[0] == name]
+        with self.reading:
+            return {key: self.__version(key) for key in keys}
+
+    def get(self, cls, id):
+        """Returns the object of cls (a class or a class name) with id"""
+        name = cls if isinstance(cls, str) else cls.__name__
+        key = name + "." + id
+        if key not in self.objects:
+            return None
+        with self.reading:
+            return self.__version(key)
+
+    def count(self, cls=None):
+        """Returns the number of objects, or of objects of cls only"""
+        if cls is None:
+            return len(self.objects)
+        if self.classes is not None:
+            name = cls if isinstance(cls, str) else cls.__name__
+            return len(self.classes.get(name, ()))
+        return len(self.all(cls))
+
+    def __version(self, key):
+        """Returns the object stored under key as it was"""
+        obj = self.versions.get(key)
+        if obj is None:
+            obj = self.objects[key]
+            if isinstance(obj, dict):
+                obj = self.versions[key] = detached(obj)
+        return obj
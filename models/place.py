@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """Defines the Place class, a subclass of BaseModel class"""
-from models.base_model import BaseModel
+import models
+from models.base_model import BaseModel, by_creation
 
 
 class Place(BaseModel):
@@ -33,3 +34,24 @@ class Place(BaseModel):
     latitude = 0.0
     longitude = 0.0
     amenity_ids = []
+    _hash_indexes = ("city_id", "user_id")
+    _sorted_indexes = ("number_rooms", "max_guest", "price_by_night")
+    _geo_index = ("latitude", "longitude")
+    _text_indexes = ("name", "description")
+
+    @property
+    def reviews(self):
+        """Returns the list of the reviews of the place"""
+        return self._related("reviews", ("Review",), lambda: by_creation(
+            models.storage.find("Review", "place_id", self.id).values()),
+            self.id)
+
+    @property
+    def amenities(self):
+        """Returns the list of the stored amenities listed in amenity_ids"""
+        ids = self.amenity_ids if isinstance(self.amenity_ids, list) else []
+        return self._related("amenities", ("Amenity",), lambda: [
+            amenity for amenity in (
+                models.storage.get("Amenity", amenity_id) for amenity_id in ids
+            ) if amenity is not None
+        ], tuple(ids))
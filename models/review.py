@@ -15,3 +15,5 @@ class Review(BaseModel):
     place_id = ''
     user_id = ''
     text = ''
+    _hash_indexes = ("place_id", "user_id")
+    _text_indexes = ("text",)
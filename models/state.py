@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """The module contains the class State which is a subclass of the BaseModel"""
-from models.base_model import BaseModel
+import models
+from models.base_model import BaseModel, by_creation
 
 
 class State(BaseModel):
@@ -11,3 +12,10 @@ class State(BaseModel):
         a) name: string-empty string
     """
     name = ''
+
+    @property
+    def cities(self):
+        """Returns the list of the cities of the state"""
+        return self._related("cities", ("City",), lambda: by_creation(
+            models.storage.find("City", "state_id", self.id).values()),
+            self.id)
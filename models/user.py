@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 """This module contains the class User which is a subclass of BaseModel"""
-from models.base_model import BaseModel
+import models
+from models.base_model import BaseModel, by_creation
 
 
 class User(BaseModel):
@@ -17,3 +18,10 @@ class User(BaseModel):
     password = ''
     first_name = ''
     last_name = ''
+
+    @property
+    def places(self):
+        """Returns the list of the places the user owns"""
+        return self._related("places", ("Place",), lambda: by_creation(
+            models.storage.find("Place", "user_id", self.id).values()),
+            self.id)
@@ -1794,6 +1794,25 @@ class TestHBNBCommand(unittest.TestCase):
             res_dict = storage.all()[f'Review.{key_id}'].__dict__
             self.assertEqual("attr_value", res_dict['attr_name'])
 
+    def test_console_update_read_only_attr(self):
+        for classname, attr in (("User", "places"), ("State", "cities"),
+                                ("City", "places"), ("Place", "reviews"),
+                                ("Place", "amenities")):
+            with patch("sys.stdout", new=StringIO()) as f:
+                self.assertFalse(HBNBCommand().onecmd(f"create {classname}"))
+                key_id = f.getvalue().strip()
+            for cmdin in (f'update {classname} {key_id} {attr} 5',
+                          f'{classname}.update({key_id}, {attr}, 5)',
+                          f'{classname}.update({key_id}, '
+                          f'{{"name": "x", "{attr}": 5}})'):
+                with patch("sys.stdout", new=StringIO()) as f:
+                    self.assertFalse(HBNBCommand().onecmd(cmdin))
+                    self.assertEqual("** attribute can't be set **",
+                                     f.getvalue().strip())
+            obj = storage.all()[f'{classname}.{key_id}']
+            self.assertNotIn("name", obj.__dict__)
+            self.assertEqual([], getattr(obj, attr))
+
     def test_console_help_quit_cmd(self):
         text = "Quit command to exit the program"
         with patch("sys.stdout", new=StringIO()) as f:
@@ -1902,3 +1921,62 @@ class TestHBNBCommandCountCmd(unittest.TestCase):
         with patch("sys.stdout", new=StringIO()) as f:
             self.assertFalse(HBNBCommand().onecmd("Review.count()"))
             self.assertEqual("14", f.getvalue().strip())
+
+
+class TestHBNBCommandSearchCmd(unittest.TestCase):
+    """unittest tests for the search command of the HBNB
+        commmand interpreter"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def test_search_missing_class(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("search"))
+            self.assertEqual("** class name missing **",
+                             f.getvalue().strip())
+
+    def test_search_invalid_class(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("search MyModel loft"))
+            self.assertEqual("** class doesn't exist **",
+                             f.getvalue().strip())
+
+    def test_search_missing_words(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            self.assertFalse(HBNBCommand().onecmd("search Review"))
+            self.assertEqual("** search words missing **",
+                             f.getvalue().strip())
+
+    def test_search_ranks_matches(self):
+        with patch("sys.stdout", new=StringIO()) as f:
+            HBNBCommand().onecmd("create Review")
+            best = f.getvalue().strip()
+        with patch("sys.stdout", new=StringIO()) as f:
+            HBNBCommand().onecmd("create Review")
+            other = f.getvalue().strip()
+        storage.get("Review", other).text = "Quiet zyxtle and clean"
+        storage.get("Review", best).text = "Zyxtle zyxtle!"
+        for command in ("search Review ZYXTLE",
+                        'Review.search("zyxtle")'):
+            with patch("sys.stdout", new=StringIO()) as f:
+                self.assertFalse(HBNBCommand().onecmd(command))
+                output = f.getvalue()
+            self.assertIn(best, output)
+            self.assertIn(other, output)
+            self.assertLess(output.index(best), output.index(other))
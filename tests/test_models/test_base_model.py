@@ -5,7 +5,7 @@ import os
 import models
 import pep8
 from datetime import datetime
-from models.base_model import BaseModel
+from models.base_model import BaseModel, registry
 
 
 class TestBaseModel(unittest.TestCase):
@@ -179,6 +179,35 @@ class TestBaseModel(unittest.TestCase):
         with self.assertRaises(TypeError):
             model.to_dict(None)
 
+    def test_base_model_kwargs_without_microseconds(self):
+        dt = datetime(2021, 11, 14, 3, 28, 45)
+        model = BaseModel(id="1", created_at=dt.isoformat(),
+                          updated_at=dt.isoformat())
+        self.assertEqual(dt, model.created_at)
+
+    def test_base_model_kwargs_with_epoch_timestamps(self):
+        dt = datetime(2021, 11, 14, 3, 28, 45, 571360)
+        model = BaseModel(id="1", created_at=dt.isoformat(),
+                          updated_at=dt.isoformat())
+        copy = BaseModel(**model.to_dict(epoch=True))
+        self.assertEqual(int, type(model.to_dict(epoch=True)["created_at"]))
+        self.assertEqual(dt, copy.created_at)
+        self.assertEqual(dt, copy.updated_at)
+        self.assertEqual(model.to_dict(), copy.to_dict())
+
+    def test_registry_holds_model_classes(self):
+        from models.user import User
+        self.assertIs(BaseModel, registry["BaseModel"])
+        self.assertIs(User, registry["User"])
+
+    def test_registry_registers_new_subclass(self):
+        class MyModel(BaseModel):
+            pass
+        try:
+            self.assertIs(MyModel, registry["MyModel"])
+        finally:
+            del registry["MyModel"]
+
 
 if __name__ == '__main__':
     unittest.main()
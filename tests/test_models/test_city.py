@@ -7,6 +7,7 @@ import pep8
 from datetime import datetime
 from models.city import City
 from models.base_model import BaseModel
+from models.place import Place
 
 
 class TestCity(unittest.TestCase):
@@ -181,6 +182,14 @@ class TestCity(unittest.TestCase):
         with self.assertRaises(TypeError):
             model.to_dict(None)
 
+    def test_places(self):
+        city = City()
+        place = Place()
+        place.city_id = city.id
+        self.assertEqual([place], city.places)
+        place.city_id = "elsewhere"
+        self.assertEqual([], city.places)
+
 
 if __name__ == '__main__':
     unittest.main()
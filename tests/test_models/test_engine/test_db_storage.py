@@ -0,0 +1,258 @@
+#!/usr/bin/python3
+"""defines all unnittest tests for the db_storage.py module"""
+import unittest
+import os
+import sqlite3
+import models
+import pep8
+from io import StringIO
+from unittest.mock import patch
+from console import HBNBCommand
+from models.engine.db_storage import DBStorage
+from models.base_model import BaseModel
+from models.user import User
+from models.state import State
+from models.city import City
+from models.place import Place
+
+
+class TestDBStorage(unittest.TestCase):
+    """unittest tests for the DBStorage engine"""
+
+    path = "test_hbnb.db"
+
+    def test_style_check(self):
+        """Test for pep8 style"""
+        style = pep8.StyleGuide(quiet=True)
+        p = style.check_files(['models/engine/db_storage.py'])
+        self.assertEqual(p.total_errors, 0, 'fix pep8')
+
+    def setUp(self):
+        self.storage = DBStorage(self.path)
+        self.storage.reload()
+
+    def tearDown(self):
+        self.storage.close()
+        try:
+            os.remove(self.path)
+        except IOError:
+            pass
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = DBStorage(self.path)
+        self.storage.reload()
+        return self.storage
+
+    def test_one_table_per_class(self):
+        conn = sqlite3.connect(self.path)
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        conn.close()
+        for name in ("BaseModel", "User", "State", "City", "Amenity",
+                     "Place", "Review"):
+            self.assertIn(name, tables)
+
+    def test_foreign_keys_are_indexed(self):
+        conn = sqlite3.connect(self.path)
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+        self.assertIn("City_state_id", indexes)
+        self.assertIn("Place_city_id", indexes)
+        self.assertIn("Review_place_id", indexes)
+
+    def test_new_save_reload(self):
+        user = User()
+        user.first_name = "Betty"
+        user.nickname = "BB"
+        place = Place()
+        place.amenity_ids = ["a", "b"]
+        place.number_rooms = 3
+        self.storage.new(user)
+        self.storage.new(place)
+        self.storage.save()
+        storage = self.reopen()
+        found = storage.get(User, user.id)
+        self.assertIsNot(found, user)
+        self.assertEqual(user.to_dict(), found.to_dict())
+        found = storage.get("Place", place.id)
+        self.assertEqual(["a", "b"], found.amenity_ids)
+        self.assertNotIn("name", storage.get(Place, place.id).__dict__)
+
+    def test_values_not_fitting_their_column(self):
+        place = Place()
+        place.name = [1, 2]
+        place.number_rooms = "three"
+        place.latitude = 1 << 70
+        place.max_guest = True
+        self.storage.new(place)
+        self.storage.save()
+        self.assertEqual(1, self.storage.count(Place))
+        storage = self.reopen()
+        found = storage.get(Place, place.id)
+        self.assertEqual(place.to_dict(), found.to_dict())
+        self.assertIs(True, found.max_guest)
+        self.assertEqual([place.id], [
+            obj.id for obj in storage.find(Place, "name", [1, 2]).values()])
+
+    def test_console_update_with_a_list(self):
+        place = Place()
+        self.storage.new(place)
+        self.storage.save()
+        with patch.object(models, "storage", self.storage), \
+                patch("sys.stdout", new=StringIO()):
+            HBNBCommand().onecmd(
+                "update Place {} name [1,2]".format(place.id))
+            self.storage.new(User())
+            self.assertEqual(1, self.storage.count(User))
+        self.assertEqual([1, 2], self.reopen().get(Place, place.id).name)
+
+    def test_all_and_count(self):
+        user = User()
+        state = State()
+        self.storage.new(user)
+        self.storage.new(state)
+        self.assertEqual({f'User.{user.id}': user}, self.storage.all(User))
+        self.assertEqual(1, self.storage.count("State"))
+        self.assertEqual(2, self.storage.count())
+        self.assertEqual(2, len(self.storage.all()))
+        self.assertEqual({}, self.storage.all("MyModel"))
+
+    def test_get_returns_same_instance(self):
+        city = City()
+        self.storage.new(city)
+        self.storage.save()
+        storage = self.reopen()
+        self.assertIs(storage.get(City, city.id), storage.get(City, city.id))
+        self.assertIsNone(storage.get(City, "1212"))
+
+    def test_delete(self):
+        state = State()
+        self.storage.new(state)
+        self.storage.save()
+        self.storage.delete(state)
+        self.assertIsNone(self.storage.get(State, state.id))
+        self.storage.save()
+        self.assertEqual(0, self.reopen().count(State))
+
+    def test_unsaved_changes_are_rolled_back_on_reload(self):
+        self.storage.new(State())
+        self.assertEqual(1, self.storage.dirty_count())
+        self.assertEqual(0, self.reopen().count(State))
+
+    def test_attribute_assignment_is_saved(self):
+        user = User()
+        self.storage.new(user)
+        self.storage.save()
+        with patch.object(models, "storage", self.storage):
+            user.first_name = "Betty"
+            self.assertEqual(1, self.storage.dirty_count())
+            self.storage.save()
+        self.assertEqual(0, self.storage.dirty_count())
+        self.assertEqual(
+            "Betty", self.reopen().get(User, user.id).first_name)
+
+    def test_batch_commits_once(self):
+        with self.storage.batch():
+            state = State()
+            self.storage.new(state)
+            self.storage.save()
+            conn = sqlite3.connect(self.path)
+            rows = conn.execute("SELECT COUNT(*) FROM State").fetchone()
+            conn.close()
+            self.assertEqual(0, rows[0])
+        self.assertEqual(1, self.reopen().count(State))
+
+    def test_batch_rollback(self):
+        with self.assertRaises(ValueError):
+            with self.storage.transaction():
+                self.storage.new(State())
+                self.storage.save()
+                raise ValueError
+        self.assertEqual(0, self.storage.count(State))
+
+    def test_find(self):
+        city = City()
+        city.state_id = "state"
+        other = City()
+        user = User()
+        user.first_name = "Betty"
+        for obj in (city, other, user):
+            self.storage.new(obj)
+        self.storage.save()
+        storage = self.reopen()
+        found = storage.find(City, "state_id", "state")
+        self.assertEqual([f'City.{city.id}'], list(found))
+        self.assertIs(found[f'City.{city.id}'], storage.get(City, city.id))
+        self.assertEqual([f'City.{other.id}'],
+                         list(storage.find("City", "state_id", "")))
+        self.assertEqual([f'User.{user.id}'],
+                         list(storage.find(User, "first_name", "Betty")))
+        self.assertEqual({}, storage.find("MyModel", "name", ""))
+
+    def test_query(self):
+        for price in (120, 80, 40):
+            place = Place()
+            place.price_by_night = price
+            self.storage.new(place)
+        query = self.storage.query(Place).where(price_by_night__lt=100)
+        prices = [p.price_by_night for p in query.order_by("price_by_night")]
+        self.assertEqual([40, 80], prices)
+        self.assertEqual(3, query.explain()["scanned"])
+
+    def test_near_and_nearest(self):
+        places = []
+        for lat, lon in ((48.85, 2.35), (48.86, 2.29), (51.5, -0.12)):
+            place = Place()
+            place.latitude = lat
+            place.longitude = lon
+            self.storage.new(place)
+            places.append(place)
+        found = self.storage.near(Place, 48.85, 2.35, 10)
+        self.assertEqual(places[:2], [obj for dist, obj in found])
+        found = self.storage.nearest(Place, 51.0, 0.0, 1)
+        self.assertEqual(places[2:], [obj for dist, obj in found])
+
+    def test_search(self):
+        user = User()
+        user.first_name = "Betty"
+        user.last_name = "Holberton"
+        other = User()
+        other.first_name = "Holberton"
+        self.storage.new(user)
+        self.storage.new(other)
+        found = self.storage.search(User, "holberton betty")
+        self.assertEqual([user, other], [obj for score, obj in found])
+
+    def test_snapshot(self):
+        user = User()
+        user.first_name = "Betty"
+        self.storage.new(user)
+        with self.storage.snapshot() as snap:
+            user.first_name = "Holberton"
+            self.storage.delete(user)
+            self.assertEqual("Betty",
+                             snap.get(User, user.id).first_name)
+            self.assertEqual(1, snap.count(User))
+        self.assertIsNone(self.storage.get(User, user.id))
+
+    def test_navigation_properties(self):
+        with patch.object(models, "storage", self.storage):
+            state = State()
+            city = City()
+            city.state_id = state.id
+            self.assertEqual([city], state.cities)
+            other = City()
+            other.state_id = state.id
+            self.assertEqual([city, other], state.cities)
+            self.storage.save()
+        storage = self.reopen()
+        with patch.object(models, "storage", storage):
+            state = storage.get(State, state.id)
+            self.assertEqual([city.id, other.id],
+                             [obj.id for obj in state.cities])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,11 +2,25 @@
 """defines all unnittest tests for the file_storage.py module"""
 import unittest
 import os
+import glob
+import random
+import json
+import time
+import zlib
 import models
 import pep8
 from datetime import datetime
 import models
+import subprocess
+import sys
+import threading
+import uuid
+from io import StringIO
+from unittest.mock import patch
 from models.engine.file_storage import FileStorage
+from models.engine.indexes import GeoIndex, SortedIndex
+from models.engine.locks import RWLock
+from models.engine.serializers import SERIALIZERS, iter_json_items
 from models.base_model import BaseModel
 from models.user import User
 from models.state import State
@@ -14,6 +28,7 @@ from models.city import City
 from models.amenity import Amenity
 from models.place import Place
 from models.review import Review
+from console import HBNBCommand
 
 
 class TestFileStorage(unittest.TestCase):
@@ -33,8 +48,28 @@ class TestFileStorage(unittest.TestCase):
             FileStorage(None)
 
     def test_all_method_with_None_as_arg(self):
-        with self.assertRaises(TypeError):
-            models.storage.all(None)
+        self.assertIs(models.storage.all(), models.storage.all(None))
+
+    def test_all_method_with_class(self):
+        user = User()
+        state = State()
+        users = models.storage.all(User)
+        self.assertIn(f'User.{user.id}', users)
+        self.assertNotIn(f'State.{state.id}', users)
+        self.assertEqual(users, models.storage.all("User"))
+        for obj in users.values():
+            self.assertIs(type(obj), User)
+
+    def test_count_method(self):
+        before = models.storage.count(City)
+        total = models.storage.count()
+        city = City()
+        self.assertEqual(before + 1, models.storage.count(City))
+        self.assertEqual(before + 1, models.storage.count("City"))
+        self.assertEqual(total + 1, models.storage.count())
+        models.storage.delete(city)
+        self.assertEqual(before, models.storage.count(City))
+        self.assertEqual(0, models.storage.count("MyModel"))
 
     def test_all_method(self):
         self.assertEqual(dict, type(models.storage.all()))
@@ -140,5 +175,1836 @@ class TestFileStorage(unittest.TestCase):
         self.assertIn(f'Review.{review.id}', all_objs)
 
 
+class TestFileStorageJournal(unittest.TestCase):
+    """unittest tests for the journaled FileStorage mode"""
+
+    @classmethod
+    def setUp(self):
+        for name in ("file.json", "file.json.log"):
+            try:
+                os.rename(name, "tmp_" + name)
+            except IOError:
+                pass
+
+    @classmethod
+    def tearDown(self):
+        for name in ("file.json", "file.json.log"):
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+            try:
+                os.rename("tmp_" + name, name)
+            except IOError:
+                pass
+
+    def test_journal_save_appends_one_record(self):
+        storage = FileStorage(journal=True)
+        storage.save()
+        user = User()
+        storage.save()
+        with open("file.json.log", "r") as f:
+            lines = f.readlines()
+        self.assertEqual(1, len(lines))
+        self.assertIn(f'User.{user.id}', lines[0])
+        self.assertFalse(os.path.exists("file.json"))
+
+    def test_journal_delete_record(self):
+        storage = FileStorage(journal=True)
+        user = User()
+        storage.save()
+        storage.delete(user)
+        storage.save()
+        with open("file.json.log", "r") as f:
+            lines = f.readlines()
+        self.assertIn('"delete"', lines[-1])
+        self.assertNotIn(f'User.{user.id}', storage.all())
+
+    def test_saving_a_deleted_object_does_not_restore_it(self):
+        storage = FileStorage(journal=True)
+        user = User()
+        storage.save()
+        storage.delete(user)
+        storage.save()
+        user.save()
+        self.assertNotIn(f'User.{user.id}', storage.all())
+        storage.reload()
+        self.assertNotIn(f'User.{user.id}', storage.all())
+
+    def test_journal_reload_replays_log(self):
+        storage = FileStorage(journal=True)
+        user = User()
+        state = State()
+        storage.save()
+        storage.delete(state)
+        storage.save()
+        storage.delete(user)
+        storage.reload()
+        self.assertIn(f'User.{user.id}', storage.all())
+        self.assertNotIn(f'State.{state.id}', storage.all())
+
+    def test_journal_reload_ignores_torn_tail(self):
+        storage = FileStorage(journal=True)
+        user = User()
+        storage.save()
+        with open("file.json.log", "a") as f:
+            f.write('{"op": "put", "key": "User.')
+        storage.delete(user)
+        storage.reload()
+        self.assertIn(f'User.{user.id}', storage.all())
+
+    def test_journal_appends_after_torn_tail(self):
+        storage = FileStorage(journal=True)
+        User()
+        storage.save()
+        with open("file.json.log", "a") as f:
+            f.write('{"op": "put", "key": "User.')
+        storage.reload()
+        first = User()
+        storage.save()
+        second = User()
+        storage.save()
+        storage.reload()
+        self.assertIn(f'User.{first.id}', storage.all())
+        self.assertIn(f'User.{second.id}', storage.all())
+        with open("file.json.log", "r") as f:
+            for line in f:
+                json.loads(line)
+
+    def test_snapshot_save_folds_log(self):
+        User()
+        FileStorage(journal=True).save()
+        FileStorage().save()
+        self.assertTrue(os.path.exists("file.json"))
+        self.assertFalse(os.path.exists("file.json.log"))
+
+
+class TestFileStorageDirtyTracking(unittest.TestCase):
+    """unittest tests for the FileStorage dirty-key tracking"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def test_dirty_count_after_save_is_zero(self):
+        User()
+        models.storage.save()
+        self.assertEqual(0, models.storage.dirty_count())
+
+    def test_new_marks_dirty(self):
+        models.storage.save()
+        User()
+        self.assertEqual(1, models.storage.dirty_count())
+
+    def test_attribute_assignment_marks_dirty(self):
+        user = User()
+        models.storage.save()
+        user.first_name = "Betty"
+        user.last_name = "Bar"
+        self.assertEqual(1, models.storage.dirty_count())
+
+    def test_reload_keeps_encodings_only_when_needed(self):
+        user = User()
+        models.storage.save()
+        encoded = FileStorage._FileStorage__encoded
+        for kwargs, kept in (({}, False), ({"journal": True}, True),
+                             ({"write_behind": 60}, True), ({}, False)):
+            FileStorage(**kwargs).reload()
+            self.assertEqual(kept, f'User.{user.id}' in encoded)
+        user = models.storage.get(User, user.id)
+        user.first_name = "Betty"
+        models.storage.save()
+        with open("file.json", "r") as f:
+            saved = json.load(f)
+        self.assertEqual(user.to_dict(), saved[f'User.{user.id}'])
+        self.assertIn(f'User.{user.id}', encoded)
+
+    def test_in_place_change_saved_after_mark_dirty(self):
+        place = Place()
+        place.amenity_ids = []
+        models.storage.save()
+        snap = models.storage.snapshot()
+        models.storage.mark_dirty(place)
+        place.amenity_ids.append("a1")
+        self.assertEqual(1, models.storage.dirty_count())
+        self.assertEqual([], snap.get(Place, place.id).amenity_ids)
+        snap.close()
+        models.storage.save()
+        models.storage.reload()
+        self.assertEqual(["a1"], models.storage.get(
+            Place, place.id).amenity_ids)
+
+    def test_in_place_change_saved_by_obj_save(self):
+        place = Place()
+        place.amenity_ids = []
+        models.storage.save()
+        place.amenity_ids.append("a2")
+        place.save()
+        models.storage.reload()
+        self.assertEqual(["a2"], models.storage.get(
+            Place, place.id).amenity_ids)
+
+    def test_unstored_instance_is_not_dirty(self):
+        models.storage.save()
+        user = User(id="121212", created_at=datetime.now().isoformat(),
+                    updated_at=datetime.now().isoformat())
+        user.first_name = "Betty"
+        self.assertEqual(0, models.storage.dirty_count())
+
+    def test_delete_marks_dirty(self):
+        user = User()
+        models.storage.save()
+        models.storage.delete(user)
+        self.assertEqual(1, models.storage.dirty_count())
+
+    def test_save_only_serializes_dirty_objects(self):
+        user = User()
+        state = State()
+        models.storage.save()
+        user.first_name = "Betty"
+        calls = []
+        to_dict = State.to_dict
+        State.to_dict = lambda self: calls.append(self) or to_dict(self)
+        try:
+            models.storage.save()
+        finally:
+            State.to_dict = to_dict
+        self.assertEqual([], calls)
+        with open("file.json", "r") as f:
+            content = f.read()
+        self.assertIn("Betty", content)
+        self.assertIn(f'State.{state.id}', content)
+
+
+class TestFileStorageStreamingReload(unittest.TestCase):
+    """unittest tests for the incremental snapshot parser"""
+
+    def test_iter_items_matches_json_load(self):
+        import json
+        payload = {
+            "User.1": {"id": "1", "first_name": "Betty, \"B\" {}"},
+            "Place.2": {"id": "2", "amenity_ids": ["a", "b"],
+                        "latitude": 37.77},
+            "State.3": {"id": "3", "name": ": }"},
+        }
+        text = json.dumps(payload, indent=2)
+        for chunk_size in (1, 2, 7, 64, 1 << 16):
+            items = list(iter_json_items(StringIO(text), chunk_size))
+            self.assertEqual(payload, {k: v for k, v, _ in items})
+            for key, val, raw in items:
+                self.assertEqual(val, json.loads(raw))
+
+    def test_iter_items_empty_object(self):
+        self.assertEqual([], list(iter_json_items(StringIO(" { } "), 1)))
+
+    def test_iter_items_truncated_file(self):
+        import json
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_items(StringIO('{"User.1": {"id": "1"}'), 4))
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_items(StringIO(""), 4))
+
+
+class TestFileStorageLazyReload(unittest.TestCase):
+    """unittest tests for the lazy FileStorage mode"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def reload_lazily(self, *objs):
+        models.storage.save()
+        for obj in objs:
+            models.storage.delete(obj)
+        storage = FileStorage(lazy=True)
+        storage.reload()
+        return storage
+
+    def test_lazy_reload_keeps_raw_records(self):
+        user = User()
+        self.reload_lazily(user)
+        raw = FileStorage._FileStorage__objects[f'User.{user.id}']
+        self.assertIs(dict, type(raw))
+        self.assertEqual(user.id, raw["id"])
+
+    def test_lazy_get_materializes_one_record(self):
+        user = User()
+        state = State()
+        storage = self.reload_lazily(user, state)
+        found = storage.get(User, user.id)
+        self.assertIs(User, type(found))
+        self.assertEqual(user.created_at, found.created_at)
+        self.assertIs(found, storage.get("User", user.id))
+        raw = FileStorage._FileStorage__objects[f'State.{state.id}']
+        self.assertIs(dict, type(raw))
+
+    def test_lazy_all_materializes(self):
+        user = User()
+        state = State()
+        storage = self.reload_lazily(user, state)
+        self.assertIs(User, type(storage.all(User)[f'User.{user.id}']))
+        raw = FileStorage._FileStorage__objects[f'State.{state.id}']
+        self.assertIs(dict, type(raw))
+        for obj in storage.all().values():
+            self.assertIsInstance(obj, BaseModel)
+
+    def test_lazy_count_and_save(self):
+        user = User()
+        count = models.storage.count(User)
+        storage = self.reload_lazily(user)
+        self.assertEqual(count, storage.count(User))
+        storage.save()
+        with open("file.json", "r") as f:
+            self.assertIn(user.id, f.read())
+
+
+class TestFileStorageShards(unittest.TestCase):
+    """unittest tests for the sharded FileStorage snapshot"""
+
+    @classmethod
+    def setUp(self):
+        for name in ["file.json"] + glob.glob("file.*.json"):
+            os.rename(name, "tmp_" + name)
+
+    @classmethod
+    def tearDown(self):
+        for name in ["file.json"] + glob.glob("file.*.json"):
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+        for name in glob.glob("tmp_file.*json"):
+            os.rename(name, name[len("tmp_"):])
+
+    def test_one_file_per_class(self):
+        storage = FileStorage(shards=1)
+        user = User()
+        state = State()
+        storage.save()
+        with open("file.User.json", "r") as f:
+            content = f.read()
+        self.assertIn(f'User.{user.id}', content)
+        self.assertNotIn(f'State.{state.id}', content)
+        with open("file.State.json", "r") as f:
+            self.assertIn(f'State.{state.id}', f.read())
+        self.assertFalse(os.path.exists("file.json"))
+
+    def test_only_dirty_shards_are_rewritten(self):
+        storage = FileStorage(shards=1)
+        user = User()
+        State()
+        storage.save()
+        os.remove("file.State.json")
+        user.first_name = "Betty"
+        storage.save()
+        self.assertFalse(os.path.exists("file.State.json"))
+        with open("file.User.json", "r") as f:
+            self.assertIn("Betty", f.read())
+
+    def test_hash_buckets(self):
+        storage = FileStorage(shards=4)
+        users = [User() for i in range(20)]
+        storage.save()
+        paths = glob.glob("file.User.*.json")
+        self.assertLessEqual(len(paths), 4)
+        self.assertGreater(len(paths), 1)
+        content = ""
+        for path in paths:
+            with open(path, "r") as f:
+                content += f.read()
+        for user in users:
+            self.assertEqual(1, content.count(f'User.{user.id}'))
+
+    def test_delete_rewrites_shard(self):
+        storage = FileStorage(shards=1)
+        amenity = Amenity()
+        storage.save()
+        storage.delete(amenity)
+        storage.save()
+        if os.path.exists("file.Amenity.json"):
+            with open("file.Amenity.json", "r") as f:
+                self.assertNotIn(amenity.id, f.read())
+
+    def test_empty_shard_is_removed(self):
+        storage = FileStorage(shards=1 << 30)
+        now = datetime.now().isoformat()
+        amenity = Amenity(id="shard-test", created_at=now, updated_at=now)
+        storage.new(amenity)
+        storage.save()
+        bucket = zlib.crc32(b"shard-test") % (1 << 30)
+        path = "file.Amenity.{}.json".format(bucket)
+        self.assertTrue(os.path.exists(path))
+        storage.delete(amenity)
+        storage.save()
+        self.assertFalse(os.path.exists(path))
+
+    def test_reload_single_class(self):
+        storage = FileStorage(shards=1)
+        user = User()
+        state = State()
+        storage.save()
+        storage.delete(user)
+        storage.delete(state)
+        storage.reload(User)
+        self.assertIsNotNone(storage.get(User, user.id))
+        self.assertIsNone(storage.get(State, state.id))
+
+    def test_single_file_save_removes_shards(self):
+        User()
+        FileStorage(shards=1).save()
+        FileStorage().save()
+        self.assertEqual([], glob.glob("file.*.json"))
+        self.assertTrue(os.path.exists("file.json"))
+
+    def test_other_files_are_not_shards(self):
+        for name in ("file.backup.json", "file.User.old.json",
+                     "file.User.01.json"):
+            with open(name, "w") as f:
+                f.write('{"User.stray": {"id": "stray"}}')
+        storage = FileStorage(shards=1)
+        User().save()
+        storage.reload()
+        self.assertIsNone(storage.get(User, "stray"))
+        FileStorage().save()
+        for name in ("file.backup.json", "file.User.old.json",
+                     "file.User.01.json"):
+            self.assertTrue(os.path.exists(name))
+
+    def test_changed_shard_count_rewrites_all(self):
+        storage = FileStorage(shards=4)
+        users = [User() for i in range(20)]
+        storage.save()
+        storage = FileStorage(shards=2)
+        for user in users:
+            user.first_name = "Betty"
+        storage.delete(users[0])
+        storage.save()
+        self.assertEqual([], [name for name in glob.glob("file.User.*.json")
+                              if name[-6] not in "01"])
+        storage.reload()
+        self.assertIsNone(storage.get(User, users[0].id))
+        for user in users[1:]:
+            self.assertEqual("Betty", storage.get(User, user.id).first_name)
+
+
+class TestFileStorageAtomicSave(unittest.TestCase):
+    """unittest tests for the atomic and group-committed saves"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        for name in ("file.json", "file.json.tmp"):
+            try:
+                os.remove(name)
+            except IOError:
+                pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def test_failed_save_keeps_previous_snapshot(self):
+        user = User()
+        models.storage.save()
+        with open("file.json", "r") as f:
+            before = f.read()
+        user.first_name = "Betty"
+        with patch("os.replace", side_effect=OSError):
+            with self.assertRaises(OSError):
+                models.storage.save()
+        with open("file.json", "r") as f:
+            self.assertEqual(before, f.read())
+
+    def test_fsync(self):
+        User()
+        with patch("os.fsync") as fsync:
+            FileStorage(fsync=True).save()
+        self.assertTrue(fsync.called)
+        with patch("os.fsync") as fsync:
+            FileStorage().save()
+        self.assertFalse(fsync.called)
+
+    def test_group_commit_coalesces_saves(self):
+        storage = FileStorage(group_commit=100)
+        commit = FileStorage._FileStorage__commit
+        calls = []
+
+        def counted(self):
+            calls.append(self)
+            commit(self)
+
+        users = []
+
+        def create_and_save():
+            users.append(User())
+            storage.save()
+
+        with patch.object(FileStorage, "_FileStorage__commit", counted):
+            threads = [threading.Thread(target=create_and_save)
+                       for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertLess(len(calls), 8)
+        with open("file.json", "r") as f:
+            content = f.read()
+        for user in users:
+            self.assertIn(user.id, content)
+
+    def test_group_commit_failure_reaches_every_saver(self):
+        storage = FileStorage(group_commit=100)
+        errors = []
+
+        def failing(self):
+            raise OSError("disk full")
+
+        def save():
+            try:
+                storage.save()
+            except OSError as e:
+                errors.append(e)
+
+        with patch.object(FileStorage, "_FileStorage__commit", failing):
+            threads = [threading.Thread(target=save) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(8, len(errors))
+
+
+class TestFileStorageWriteBehind(unittest.TestCase):
+    """unittest tests for the write-behind FileStorage mode"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def test_save_returns_before_writing(self):
+        storage = FileStorage(write_behind=60)
+        User()
+        storage.save()
+        self.assertFalse(os.path.exists("file.json"))
+        self.assertEqual(0, storage.dirty_count())
+        storage.flush()
+        self.assertTrue(os.path.exists("file.json"))
+
+    def test_flush_writes_unsaved_changes(self):
+        storage = FileStorage(write_behind=60)
+        user = User()
+        storage.flush()
+        with open("file.json", "r") as f:
+            self.assertIn(user.id, f.read())
+
+    def test_background_flush_on_threshold(self):
+        storage = FileStorage(write_behind=60, flush_threshold=2)
+        User()
+        User()
+        storage.save()
+        for i in range(100):
+            if os.path.exists("file.json"):
+                break
+            threading.Event().wait(0.01)
+        self.assertTrue(os.path.exists("file.json"))
+
+    def test_background_flush_on_interval(self):
+        storage = FileStorage(write_behind=0.05)
+        user = User()
+        storage.save()
+        for i in range(100):
+            if os.path.exists("file.json"):
+                break
+            threading.Event().wait(0.01)
+        with open("file.json", "r") as f:
+            self.assertIn(user.id, f.read())
+
+    def test_background_flush_writes_saved_changes_only(self):
+        for shards in (0, 1):
+            storage = FileStorage(write_behind=0.05, shards=shards)
+            path = "file.User.json" if shards else "file.json"
+            if shards:
+                self.addCleanup(os.remove, path)
+            kept = User()
+            storage.flush()
+            saved = User()
+            storage.save()
+            unsaved = User()
+            storage.delete(kept)
+            for i in range(100):
+                with open(path, "r") as f:
+                    content = f.read()
+                if saved.id in content:
+                    break
+                threading.Event().wait(0.01)
+            self.assertIn(saved.id, content)
+            self.assertIn(kept.id, content)
+            self.assertNotIn(unsaved.id, content)
+            storage.flush()
+
+
+class TestFileStorageBatch(unittest.TestCase):
+    """unittest tests for FileStorage.batch()"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def test_batch_saves_once(self):
+        commit = FileStorage._FileStorage__commit
+        calls = []
+
+        def counted(self, *args, **kwargs):
+            calls.append(self)
+            commit(self, *args, **kwargs)
+
+        with patch.object(FileStorage, "_FileStorage__commit", counted):
+            with models.storage.batch():
+                users = [User() for i in range(5)]
+                for user in users:
+                    user.save()
+                self.assertEqual([], calls)
+        self.assertEqual(1, len(calls))
+        with open("file.json", "r") as f:
+            content = f.read()
+        for user in users:
+            self.assertIn(user.id, content)
+
+    def test_batch_rollback(self):
+        user = User()
+        user.first_name = "Betty"
+        state = State()
+        models.storage.save()
+        with self.assertRaises(ValueError):
+            with models.storage.transaction():
+                user.first_name = "John"
+                user.last_name = "Bar"
+                models.storage.delete(state)
+                city = City()
+                city.save()
+                raise ValueError
+        self.assertEqual("Betty", user.first_name)
+        self.assertNotIn("last_name", user.__dict__)
+        self.assertIs(state, models.storage.get(State, state.id))
+        self.assertIsNone(models.storage.get(City, city.id))
+        self.assertNotIn(f'City.{city.id}', models.storage.all(City))
+        self.assertEqual(0, models.storage.dirty_count())
+
+    def test_nested_batch(self):
+        with models.storage.batch():
+            with models.storage.batch():
+                user = User()
+            self.assertFalse(os.path.exists("file.json"))
+        with open("file.json", "r") as f:
+            self.assertIn(user.id, f.read())
+
+
+class TestFileStorageCompression(unittest.TestCase):
+    """unittest tests for the compressed snapshot formats"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            FileStorage(compression="zip")
+
+    def test_compressed_round_trip(self):
+        headers = {"gzip": b"\x1f\x8b", "zlib": b"\x78",
+                   "lzma": b"\xfd7zXZ\x00"}
+        for codec, header in headers.items():
+            user = User()
+            user.first_name = "Betty \u00e9"
+            storage = FileStorage(compression=codec, compression_level=1)
+            storage.save()
+            with open("file.json", "rb") as f:
+                self.assertTrue(f.read().startswith(header), codec)
+            storage.delete(user)
+            storage.reload()
+            found = storage.get(User, user.id)
+            self.assertEqual(user.to_dict(), found.to_dict(), codec)
+
+    def test_epoch_timestamps_round_trip(self):
+        user = User()
+        storage = FileStorage(epoch_timestamps=True)
+        storage.save()
+        with open("file.json", "r") as f:
+            content = f.read()
+        self.assertNotIn(user.created_at.isoformat(), content)
+        storage.delete(user)
+        storage.reload()
+        found = storage.get(User, user.id)
+        self.assertEqual(user.created_at, found.created_at)
+        self.assertEqual(user.updated_at, found.updated_at)
+
+    def test_plain_reload_after_compressed(self):
+        user = User()
+        FileStorage(compression="zlib").save()
+        FileStorage().save()
+        with open("file.json", "r") as f:
+            self.assertIn(user.id, f.read())
+
+
+class TestFileStorageColumnar(unittest.TestCase):
+    """unittest tests for the columnar mode of FileStorage"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+        FileStorage().reload()
+
+    def test_columnar_round_trip(self):
+        place = Place()
+        place.name = "Loft"
+        place.number_rooms = 3
+        place.latitude = 37.7
+        place.amenity_ids = ["a", "b"]
+        place.city_id = "city"
+        storage = FileStorage(columnar=True)
+        storage.save()
+        storage.reload()
+        found = storage.get(Place, place.id)
+        self.assertIsNot(found, place)
+        self.assertIsInstance(found, Place)
+        self.assertEqual(type(found).__name__, "Place")
+        self.assertEqual(found.to_dict(), place.to_dict())
+        self.assertEqual(found.price_by_night, 0)
+        self.assertNotIn("price_by_night", found.to_dict())
+
+    def test_columnar_assignments_are_saved(self):
+        place = Place()
+        storage = FileStorage(columnar=True)
+        storage.save()
+        storage.reload()
+        found = storage.get(Place, place.id)
+        found.number_rooms = 4
+        found.max_guest = "many"
+        found.nickname = "Nest"
+        self.assertEqual(storage.dirty_count(), 1)
+        self.assertEqual(found.max_guest, "many")
+        self.assertEqual(found.nickname, "Nest")
+        storage.save()
+        FileStorage().reload()
+        found = storage.get(Place, place.id)
+        self.assertEqual(found.number_rooms, 4)
+        self.assertEqual(found.max_guest, "many")
+        self.assertEqual(found.nickname, "Nest")
+
+    def test_columnar_batch_rollback(self):
+        user = User()
+        user.first_name = "Betty"
+        storage = FileStorage(columnar=True)
+        storage.save()
+        storage.reload()
+        found = storage.get(User, user.id)
+        with self.assertRaises(RuntimeError):
+            with models.storage.batch():
+                found.first_name = "Holberton"
+                found.age = 89
+                raise RuntimeError
+        self.assertEqual(found.first_name, "Betty")
+        self.assertFalse(hasattr(found, "age"))
+
+
+class TestFileStorageHashIndexes(unittest.TestCase):
+    """unittest tests for the foreign key indexes of FileStorage"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def test_find_follows_new_update_and_delete(self):
+        city = City()
+        city.state_id = "index-state"
+        self.assertEqual({f'City.{city.id}': city},
+                         models.storage.find(City, "state_id", "index-state"))
+        city.state_id = "index-other"
+        self.assertEqual({}, models.storage.find(City, "state_id",
+                                                 "index-state"))
+        self.assertIn(f'City.{city.id}',
+                      models.storage.find("City", "state_id", "index-other"))
+        models.storage.delete(city)
+        self.assertEqual({}, models.storage.find(City, "state_id",
+                                                 "index-other"))
+
+    def test_find_does_not_scan(self):
+        review = Review()
+        review.place_id = "index-place"
+        with patch.object(FileStorage, "all", side_effect=AssertionError):
+            found = models.storage.find(Review, "place_id", "index-place")
+        self.assertEqual({f'Review.{review.id}': review}, found)
+
+    def test_find_without_index(self):
+        user = User()
+        user.first_name = "Index Betty"
+        self.assertEqual({f'User.{user.id}': user},
+                         models.storage.find(User, "first_name",
+                                             "Index Betty"))
+
+    def test_find_after_reload_and_rollback(self):
+        place = Place()
+        place.city_id = "index-city"
+        models.storage.save()
+        for lazy in (False, True):
+            storage = FileStorage(lazy=lazy)
+            storage.reload()
+            found = storage.find(Place, "city_id", "index-city")
+            self.assertEqual([f'Place.{place.id}'], list(found))
+            self.assertIsInstance(found[f'Place.{place.id}'], Place)
+        place = found[f'Place.{place.id}']
+        with self.assertRaises(ValueError):
+            with models.storage.batch():
+                place.city_id = "index-moved"
+                raise ValueError
+        self.assertEqual({}, models.storage.find(Place, "city_id",
+                                                 "index-moved"))
+        self.assertIn(f'Place.{place.id}',
+                      models.storage.find(Place, "city_id", "index-city"))
+
+
+class TestFileStorageQuery(unittest.TestCase):
+    """unittest tests for storage.query()"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def make_places(self):
+        self.city = str(uuid.uuid4())
+        places = []
+        for price in (120, 80, 40, 95):
+            place = Place()
+            place.city_id = self.city
+            place.price_by_night = price
+            places.append(place)
+        other = Place()
+        other.city_id = str(uuid.uuid4())
+        other.price_by_night = 10
+        return places
+
+    def test_where_order_by_limit(self):
+        places = self.make_places()
+        query = models.storage.query(Place).where(
+            city_id=self.city, price_by_night__lt=100)
+        self.assertEqual({places[1], places[2], places[3]}, set(query))
+        query.order_by("-price_by_night").limit(2)
+        self.assertEqual([places[3], places[1]], query.all())
+        self.assertIs(places[3], query.first())
+
+    def test_query_is_lazy(self):
+        self.make_places()
+        query = models.storage.query(Place).where(city_id=self.city)
+        rows = iter(query)
+        next(rows)
+        self.assertEqual(1, query.scanned)
+
+    def test_explain_uses_hash_index(self):
+        self.make_places()
+        query = models.storage.query("Place").where(
+            price_by_night__ne=40, city_id=self.city)
+        report = query.explain()
+        self.assertTrue(report["plan"][0].startswith(
+            "HASH INDEX Place.city_id eq {!r}".format(self.city)))
+        self.assertEqual(4, report["scanned"])
+        self.assertEqual(3, report["returned"])
+
+    def test_explain_scan(self):
+        places = self.make_places()
+        places[2].name = self.city
+        query = models.storage.query(Place).where(name=self.city)
+        report = query.explain()
+        self.assertTrue(report["plan"][0].startswith("SCAN Place"))
+        self.assertEqual(models.storage.count(Place), report["scanned"])
+        self.assertEqual(1, report["returned"])
+
+    def test_in_with_repeated_values(self):
+        places = self.make_places()
+        query = models.storage.query(Place).where(
+            city_id__in=[self.city, self.city, [self.city]])
+        self.assertEqual(places, sorted(query.all(), key=places.index))
+        report = query.explain()
+        self.assertTrue(report["plan"][0].startswith(
+            "HASH INDEX Place.city_id in"))
+        self.assertEqual(4, report["scanned"])
+        self.assertEqual(4, models.storage.indexes(Place)["city_id"].estimate(
+            "in", [self.city, self.city]))
+
+    def test_order_by_mixed_types(self):
+        places = self.make_places()
+        places[1].price_by_night = "abc"
+        for order, expected in (("price_by_night", [2, 3, 0, 1]),
+                                ("-price_by_night", [0, 3, 2, 1])):
+            sorted_rows = models.storage.query(Place).where(
+                city_id=self.city).order_by(order)
+            self.assertEqual("SORT {}".format(order),
+                             sorted_rows.explain()["plan"][-1])
+            from_index = [place for place in models.storage.query(
+                Place).order_by(order) if place.city_id == self.city]
+            self.assertEqual([places[i] for i in expected],
+                             sorted_rows.all())
+            self.assertEqual(from_index, sorted_rows.all())
+
+    def test_unknown_operator(self):
+        with self.assertRaises(ValueError):
+            models.storage.query(Place).where(price_by_night__near=3)
+
+
+class TestFileStorageSortedIndex(unittest.TestCase):
+    """unittest tests for the sorted indexes of FileStorage"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def make_places(self, prices):
+        places = []
+        for price in prices:
+            place = Place()
+            place.price_by_night = price
+            places.append(place)
+        return places
+
+    def test_range_query_reads_only_the_range(self):
+        places = self.make_places([-7003, -7001, -7002, -7010])
+        query = models.storage.query(Place).where(
+            price_by_night__range=(-7003, -7001))
+        query.order_by("price_by_night")
+        self.assertEqual([places[0], places[2], places[1]], query.all())
+        report = query.explain()
+        self.assertTrue(report["plan"][0].startswith(
+            "SORTED INDEX Place.price_by_night range"))
+        self.assertIn("ORDER BY INDEX price_by_night", report["plan"])
+        self.assertEqual(3, report["scanned"])
+        query = models.storage.query(Place).where(price_by_night__lt=-7005)
+        self.assertEqual([places[3]], query.all())
+
+    def test_ordered_limit_stops_early(self):
+        places = self.make_places([10 ** 12, 10 ** 12 + 1])
+        query = models.storage.query(Place).order_by("-price_by_night")
+        self.assertEqual([places[1], places[0]], query.limit(2).all())
+        self.assertEqual(2, query.scanned)
+
+    def test_console_update_and_reload(self):
+        place, = self.make_places([-8001])
+        models.storage.save()
+        with patch('sys.stdout', new=StringIO()):
+            HBNBCommand().onecmd(
+                "update Place {} price_by_night -8002".format(place.id))
+        query = models.storage.query(Place)
+        self.assertEqual([], query.where(price_by_night=-8001).all())
+        query = models.storage.query(Place).where(price_by_night=-8002)
+        self.assertEqual([place], query.all())
+        models.storage.reload()
+        place = models.storage.query(Place).where(
+            price_by_night=-8002).first()
+        self.assertIsNot(None, place)
+        place.price_by_night = "free"
+        query = models.storage.query(Place).where(price_by_night="free")
+        self.assertEqual([place], query.all())
+
+    def test_batched_changes_merge_on_read(self):
+        index = SortedIndex("price_by_night")
+        for i in range(100):
+            index.add(i % 10, "Place.{:03}".format(i))
+        index.remove(3, "Place.003")
+        index.add(3, "Place.003")
+        index.remove(5, "Place.005")
+        index.add(2.5, "Place.005")
+        index.add("free", "Place.100")
+        self.assertEqual(100, len(index.added))
+        expected = sorted((i % 10, "Place.{:03}".format(i))
+                          for i in range(100) if i != 5)
+        expected.insert(30, (2.5, "Place.005"))
+        self.assertEqual([key for value, key in expected] + ["Place.100"],
+                         index.keys("order", None))
+        self.assertEqual({}, index.added)
+        index.remove(0, "Place.010")
+        index.add(11, "Place.010")
+        self.assertEqual(["Place.010"], index.keys("gt", 9))
+        self.assertEqual(9, index.estimate("eq", 0))
+
+
+class TestFileStorageGeoIndex(unittest.TestCase):
+    """unittest tests for the geographic searches of FileStorage"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def make_place(self, lat, lon):
+        place = Place()
+        place.latitude = lat
+        place.longitude = lon
+        return place
+
+    def test_near_and_nearest(self):
+        first = self.make_place(-37.77, -122.42)
+        second = self.make_place(-37.80, -122.27)
+        far = self.make_place(-34.05, -118.24)
+        found = models.storage.near(Place, -37.77, -122.42, 20)
+        self.assertEqual([first, second], [obj for dist, obj in found])
+        self.assertAlmostEqual(0.0, found[0][0])
+        self.assertAlmostEqual(13.5, found[1][0], delta=0.5)
+        found = models.storage.nearest("Place", -37.0, -120.0, 2)
+        self.assertEqual([first, second], sorted(
+            [obj for dist, obj in found], key=lambda obj: obj.longitude))
+        found = models.storage.nearest(Place, -34.0, -118.0, 1)
+        self.assertEqual([far], [obj for dist, obj in found])
+
+    def test_moved_place_is_found_at_its_new_position(self):
+        place = self.make_place(-60.5, 150.5)
+        models.storage.save()
+        with patch('sys.stdout', new=StringIO()):
+            HBNBCommand().onecmd(
+                "update Place {} latitude -61.5".format(place.id))
+        self.assertEqual([], models.storage.near(Place, -60.5, 150.5, 10))
+        found = models.storage.near(Place, -61.5, 150.5, 10)
+        self.assertEqual([place], [obj for dist, obj in found])
+        models.storage.delete(place)
+        self.assertEqual([], models.storage.near(Place, -61.5, 150.5, 10))
+
+    def test_nearest_with_wide_rings(self):
+        rand = random.Random(18)
+        index = GeoIndex(("latitude", "longitude"), cell=30)
+        for i in range(200):
+            index.add((rand.uniform(-90, 90), rand.uniform(-180, 180)),
+                      str(i))
+        for i in range(300):
+            lat = rand.choice((-1, 1)) * rand.uniform(60, 90)
+            lon = rand.uniform(-180, 180)
+            k = rand.randint(1, 20)
+            found = index.nearest(lat, lon, k)
+            keys = [key for dist, key in found]
+            self.assertEqual(len(set(keys)), len(keys))
+            expected = index.near(lat, lon, 40000)[:k]
+            self.assertEqual([dist for dist, key in expected],
+                             [dist for dist, key in found])
+
+    def test_class_without_geo_index(self):
+        user = User()
+        user.latitude = -45.0
+        user.longitude = 100.0
+        found = models.storage.near(User, -45.0, 100.0, 1)
+        self.assertEqual([user], [obj for dist, obj in found])
+
+
+class TestFileStorageTextIndex(unittest.TestCase):
+    """unittest tests for the full-text search of FileStorage"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+
+    def test_search_ranks_and_follows_updates(self):
+        loft = Place()
+        loft.name = "Qwertyloft"
+        loft.description = "A bright qwertyloft, the best qwertyloft"
+        flat = Place()
+        flat.description = "Flat next to a qwertyloft"
+        found = models.storage.search(Place, "QWERTYLOFT garden")
+        self.assertEqual([loft, flat], [obj for score, obj in found])
+        self.assertGreater(found[0][0], found[1][0])
+        loft.name = "Garden house"
+        loft.description = ""
+        found = models.storage.search("Place", "qwertyloft")
+        self.assertEqual([flat], [obj for score, obj in found])
+        models.storage.delete(flat)
+        self.assertEqual([], models.storage.search(Place, "qwertyloft"))
+
+    def test_search_after_reload(self):
+        review = Review()
+        review.text = "Asdfgh view"
+        models.storage.save()
+        models.storage.reload()
+        found = models.storage.search(Review, "asdfgh", limit=1)
+        self.assertEqual([review.id], [obj.id for score, obj in found])
+
+    def test_search_without_text_index(self):
+        user = User()
+        user.first_name = "Zxcvbn"
+        found = models.storage.search(User, "zxcvbn")
+        self.assertEqual([user], [obj for score, obj in found])
+
+
+class TestFileStorageShared(unittest.TestCase):
+    """unittest tests for several processes sharing the storage files"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        for path in ("file.json", "file.json.log", "file.json.lock"):
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+        FileStorage().reload()
+
+    def other_process(self, code, journal=False):
+        """runs code in another process using the same files"""
+        env = dict(os.environ, HBNB_FILE_SHARED="1")
+        env.pop("HBNB_TYPE_STORAGE", None)
+        if journal:
+            env["HBNB_FILE_JOURNAL"] = "1"
+        output = subprocess.run(
+            [sys.executable, "-c", "import models\n" + code],
+            env=env, check=True, capture_output=True, text=True)
+        return output.stdout.strip()
+
+    def test_refresh_reads_other_saves(self):
+        storage = FileStorage(shared=True)
+        storage.save()
+        storage.reload()
+        self.assertEqual(0, storage.refresh())
+        user_id = self.other_process(
+            "from models.user import User\n"
+            "user = User()\nuser.first_name = 'Betty'\nuser.save()\n"
+            "print(user.id)")
+        self.assertIsNone(storage.get(User, user_id))
+        self.assertEqual(1, storage.refresh())
+        self.assertEqual("Betty", storage.get(User, user_id).first_name)
+        self.assertEqual(0, storage.refresh())
+
+    def test_save_keeps_other_writes(self):
+        storage = FileStorage(shared=True)
+        state = State()
+        storage.save()
+        storage.reload()
+        mine = City()
+        theirs = self.other_process(
+            "from models.user import User\n"
+            "user = User()\nuser.save()\n"
+            "models.storage.delete(models.storage.get('State', '{}'))\n"
+            "models.storage.save()\nprint(user.id)".format(state.id))
+        storage.save()
+        with open("file.json", "r") as f:
+            content = f.read()
+        self.assertIn(theirs, content)
+        self.assertIn(mine.id, content)
+        self.assertNotIn(state.id, content)
+        self.assertIsNone(storage.get(State, state.id))
+
+    def test_journal_refresh_reads_the_log_tail(self):
+        storage = FileStorage(shared=True, journal=True)
+        user = User()
+        storage.save()
+        storage.reload()
+        self.other_process(
+            "user = models.storage.get('User', '{}')\n"
+            "user.first_name = 'Holberton'\n"
+            "user.save()".format(user.id), journal=True)
+        with patch.object(FileStorage, "_FileStorage__load") as load:
+            self.assertEqual(1, storage.refresh())
+            load.assert_not_called()
+        self.assertEqual("Holberton",
+                         storage.get(User, user.id).first_name)
+
+    def test_unsaved_changes_win(self):
+        storage = FileStorage(shared=True)
+        user = User()
+        storage.save()
+        storage.reload()
+        user = storage.get(User, user.id)
+        self.other_process(
+            "user = models.storage.get('User', '{}')\n"
+            "user.first_name = 'Theirs'\n"
+            "user.save()".format(user.id))
+        user.first_name = "Mine"
+        storage.save()
+        self.assertEqual("Mine", storage.get(User, user.id).first_name)
+        self.assertEqual("Mine", self.other_process(
+            "print(models.storage.get('User', '{}').first_name)".format(
+                user.id)))
+
+
+class TestFileStorageCompaction(unittest.TestCase):
+    """unittest tests for folding the journal log into the snapshot"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        for path in ("file.json", "file.json.log", "file.json.log.1",
+                     "file.json.lock"):
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+        FileStorage().reload()
+
+    def saved_user(self, storage, renames=5):
+        """Returns a user saved once then renamed renames times"""
+        user = User()
+        storage.save()
+        for i in range(renames):
+            user.first_name = "name{}".format(i)
+            storage.save()
+        return user
+
+    def test_compact_after_plain_reload(self):
+        user = User()
+        FileStorage().save()
+        FileStorage().reload()
+        storage = FileStorage(journal=True)
+        state = State()
+        storage.save()
+        storage.compact()
+        storage.reload()
+        self.assertIn(f'User.{user.id}', storage.all())
+        self.assertIn(f'State.{state.id}', storage.all())
+
+    def test_compact_folds_the_log(self):
+        storage = FileStorage(journal=True)
+        user = self.saved_user(storage)
+        log_size = os.path.getsize("file.json.log")
+        run = storage.compact()
+        self.assertFalse(os.path.exists("file.json.log"))
+        self.assertFalse(os.path.exists("file.json.log.1"))
+        with open("file.json", "r") as f:
+            self.assertEqual("name4", json.load(f)["User." + user.id]
+                             ["first_name"])
+        self.assertGreaterEqual(run["seconds"], 0)
+        self.assertEqual(1, storage.compaction_stats["compactions"])
+        self.assertEqual(run["bytes_reclaimed"],
+                         storage.compaction_stats["bytes_reclaimed"])
+        self.assertEqual(log_size - os.path.getsize("file.json"),
+                         run["bytes_reclaimed"])
+        storage.reload()
+        self.assertEqual("name4", storage.get(User, user.id).first_name)
+
+    def test_reload_replays_an_interrupted_compaction(self):
+        storage = FileStorage(journal=True)
+        user = self.saved_user(storage, 1)
+        os.rename("file.json.log", "file.json.log.1")
+        user.last_name = "Holberton"
+        storage.save()
+        storage.reload()
+        user = storage.get(User, user.id)
+        self.assertEqual("name0", user.first_name)
+        self.assertEqual("Holberton", user.last_name)
+        storage.compact()
+        self.assertFalse(os.path.exists("file.json.log.1"))
+        storage.reload()
+        self.assertEqual("Holberton", storage.get(User, user.id).last_name)
+
+    def test_saves_during_compaction_are_kept(self):
+        storage = FileStorage(journal=True)
+        user = self.saved_user(storage)
+        write_file = storage._FileStorage__write_file
+
+        def write_then_save(path, text, mode="w"):
+            write_file(path, text, mode)
+            if mode == "w":
+                storage.get(User, user.id).first_name = "During"
+                storage.save()
+
+        with patch.object(storage, "_FileStorage__write_file",
+                          side_effect=write_then_save):
+            storage.compact()
+        self.assertTrue(os.path.exists("file.json.log"))
+        storage.reload()
+        self.assertEqual("During", storage.get(User, user.id).first_name)
+
+    def test_snapshot_rewritten_meanwhile_abandons(self):
+        storage = FileStorage(journal=True)
+        user = self.saved_user(storage, 2)
+        write_file = storage._FileStorage__write_file
+
+        def write_then_rewrite(path, text, mode="w"):
+            write_file(path, text, mode)
+            storage.get(User, user.id).first_name = "Snapshot"
+            FileStorage().save()
+
+        with patch.object(storage, "_FileStorage__write_file",
+                          side_effect=write_then_rewrite):
+            self.assertIsNone(storage.compact())
+        self.assertEqual(1, storage.compaction_stats["abandoned"])
+        self.assertFalse(os.path.exists("file.json.compacting"))
+        storage.reload()
+        self.assertEqual("Snapshot", storage.get(User, user.id).first_name)
+
+    def test_threshold_starts_background_compaction(self):
+        storage = FileStorage(journal=True, compact_bytes=1)
+        user = self.saved_user(storage, 1)
+        deadline = time.time() + 5
+        while storage.compaction_stats["compactions"] == 0 and \
+                time.time() < deadline:
+            time.sleep(0.01)
+        storage.compact()
+        self.assertGreaterEqual(storage.compaction_stats["compactions"], 2)
+        self.assertFalse(os.path.exists("file.json.log"))
+        storage.reload()
+        self.assertEqual("name0", storage.get(User, user.id).first_name)
+
+    def test_ratio_threshold(self):
+        storage = FileStorage(journal=True, compact_ratio=2)
+        storage.compact_min_bytes = 0
+        due = storage._FileStorage__compaction_due
+        self.saved_user(storage, 0)
+        storage.compact()
+        self.assertFalse(due())
+        snapshot = os.path.getsize("file.json")
+        self.saved_user(storage, 0)
+        while os.path.getsize("file.json.log") < 2 * snapshot:
+            self.assertFalse(due())
+            self.saved_user(storage, 0)
+        self.assertTrue(due())
+
+    def test_shared_refresh_follows_a_rotated_log(self):
+        storage = FileStorage(shared=True, journal=True)
+        user = User()
+        FileStorage(shared=True).save()
+        storage.reload()
+        env = dict(os.environ, HBNB_FILE_SHARED="1", HBNB_FILE_JOURNAL="1")
+        env.pop("HBNB_TYPE_STORAGE", None)
+        subprocess.run(
+            [sys.executable, "-c",
+             "import models\n"
+             "user = models.storage.get('User', '{}')\n"
+             "user.first_name = 'Before'\nuser.save()\n"
+             "models.storage.compact()\n"
+             "user.first_name = 'After'\nuser.save()".format(user.id)],
+            env=env, check=True)
+        self.assertGreaterEqual(storage.refresh(), 1)
+        self.assertEqual("After", storage.get(User, user.id).first_name)
+        self.assertEqual(0, storage.refresh())
+
+
+class TestFileStorageSnapshot(unittest.TestCase):
+    """unittest tests for the read snapshots of the storage"""
+
+    def test_snapshot_keeps_the_objects_as_they_were(self):
+        storage = FileStorage()
+        user = User()
+        user.first_name = "Betty"
+        gone = User()
+        with storage.snapshot() as snap:
+            user.first_name = "Holberton"
+            storage.delete(gone)
+            added = User()
+            self.assertEqual("Betty", snap.get(User, user.id).first_name)
+            self.assertIsNotNone(snap.get(User, gone.id))
+            self.assertIsNone(snap.get(User, added.id))
+            self.assertIn("User." + gone.id, snap.all(User))
+            self.assertNotIn("User." + added.id, snap.all())
+            self.assertEqual(len(snap.all(User)), snap.count(User))
+        self.assertEqual("Holberton", storage.get(User, user.id).first_name)
+        self.assertIsNone(storage.get(User, gone.id))
+        self.assertEqual({}, snap.all())
+        self.assertEqual([], FileStorage._FileStorage__snapshots)
+
+    def test_iterating_while_deleting(self):
+        storage = FileStorage()
+        for i in range(5):
+            User()
+        with storage.snapshot() as snap:
+            before = snap.count(User)
+            for key, obj in snap.all(User).items():
+                storage.delete(storage.get(User, obj.id))
+            self.assertEqual(before, snap.count(User))
+        self.assertEqual(0, storage.count(User))
+
+    def test_no_copy_without_changes(self):
+        storage = FileStorage()
+        objects = storage.all()
+        with storage.snapshot():
+            pass
+        User()
+        self.assertIs(objects, storage.all())
+        with storage.snapshot():
+            User()
+        self.assertIsNot(objects, storage.all())
+
+    def test_versions_are_shared_and_dropped(self):
+        storage = FileStorage()
+        user = User()
+        first = storage.snapshot()
+        second = storage.snapshot()
+        user.first_name = "Betty"
+        self.assertIs(first.versions["User." + user.id],
+                      second.versions["User." + user.id])
+        first.close()
+        user.last_name = "Holberton"
+        self.assertNotIn("first_name", second.get(User, user.id).__dict__)
+        second.close()
+        self.assertEqual({}, second.versions)
+
+    def test_batch_rollback_keeps_the_snapshot(self):
+        storage = models.storage
+        user = User()
+        user.first_name = "Betty"
+        with storage.snapshot() as snap:
+            with self.assertRaises(ValueError):
+                with storage.batch():
+                    user.first_name = "Holberton"
+                    raise ValueError
+            self.assertEqual("Betty", snap.get(User, user.id).first_name)
+
+    def test_console_all_reads_a_snapshot(self):
+        user = User()
+        with patch.object(FileStorage, "snapshot",
+                          wraps=models.storage.snapshot) as snapshot:
+            with patch("sys.stdout", new=StringIO()) as f:
+                HBNBCommand().onecmd("all User")
+            snapshot.assert_called_once()
+        self.assertIn(user.id, f.getvalue())
+
+
+class TestFileStorageThreadSafe(unittest.TestCase):
+    """unittest tests for threads sharing the storage"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        try:
+            os.remove("file.json")
+        except IOError:
+            pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+        FileStorage().reload()
+
+    def test_rwlock_readers_share_writers_wait(self):
+        lock = RWLock()
+        both = threading.Barrier(2, timeout=5)
+        order = []
+
+        def reader():
+            with lock.reading:
+                both.wait()
+                time.sleep(0.05)
+                order.append("read")
+
+        def writer():
+            with lock.writing:
+                order.append("write")
+
+        readers = [threading.Thread(target=reader) for i in range(2)]
+        for thread in readers:
+            thread.start()
+        time.sleep(0.01)
+        late = threading.Thread(target=writer)
+        late.start()
+        for thread in readers + [late]:
+            thread.join(5)
+        self.assertEqual(["read", "read", "write"], order)
+
+    def test_rwlock_is_reentrant(self):
+        lock = RWLock()
+        with lock.writing:
+            with lock.writing, lock.reading:
+                pass
+        with lock.reading:
+            with lock.reading:
+                with self.assertRaises(RuntimeError):
+                    lock.acquire_write()
+        with self.assertRaises(RuntimeError):
+            lock.release_write()
+        with lock.writing:
+            pass
+
+    def test_all_is_a_copy(self):
+        storage = FileStorage(threadsafe=True)
+        self.assertIsNot(storage.all(), storage.all())
+        self.assertIs(FileStorage().all(), FileStorage().all())
+
+    def test_stress(self):
+        storage = FileStorage(threadsafe=True)
+        errors = []
+        created = [[] for i in range(4)]
+        done = threading.Event()
+
+        def write(mine):
+            try:
+                for i in range(150):
+                    user = User()
+                    user.first_name = "stress"
+                    mine.append(user.id)
+                    if i % 3 == 0:
+                        storage.delete(storage.get(User, mine.pop(0)))
+                    if i % 25 == 0:
+                        storage.save()
+            except Exception as exc:
+                errors.append(exc)
+
+        def read():
+            try:
+                while not done.is_set():
+                    with storage.reading:
+                        count = storage.count(User)
+                        self.assertEqual(count, len(storage.all(User)))
+                    for obj in storage.all().values():
+                        str(obj)
+                    storage.query(User).where(first_name="stress").all()
+                    with storage.snapshot() as snap:
+                        for obj in snap.all(User).values():
+                            obj.to_dict()
+            except Exception as exc:
+                errors.append(exc)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        with patch.object(models, "storage", storage):
+            readers = [threading.Thread(target=read) for i in range(4)]
+            writers = [threading.Thread(target=write, args=(mine,))
+                       for mine in created]
+            for thread in readers + writers:
+                thread.start()
+            for thread in writers:
+                thread.join(60)
+            done.set()
+            for thread in readers:
+                thread.join(60)
+            storage.save()
+        self.assertEqual([], errors)
+        with open("file.json", "r") as f:
+            saved = json.load(f)
+        for mine in created:
+            self.assertEqual(100, len(mine))
+            for user_id in mine:
+                self.assertEqual("stress",
+                                 saved["User." + user_id]["first_name"])
+
+    def test_batch_of_another_thread(self):
+        storage = FileStorage(threadsafe=True)
+        opened = threading.Event()
+        saved = []
+
+        def other():
+            opened.wait(5)
+            user = User()
+            user.save()
+            saved.append(user)
+
+        thread = threading.Thread(target=other)
+        with patch.object(models, "storage", storage):
+            thread.start()
+            with self.assertRaises(ValueError):
+                with storage.batch():
+                    opened.set()
+                    State()
+                    time.sleep(0.05)
+                    raise ValueError
+            thread.join(5)
+        user = saved[0]
+        self.assertIs(user, storage.get(User, user.id))
+        with open("file.json", "r") as f:
+            self.assertIn(f'User.{user.id}', json.load(f))
+
+
+class TestFileStorageSerializers(unittest.TestCase):
+    """unittest tests for the snapshot serializers"""
+
+    @classmethod
+    def setUp(self):
+        try:
+            os.rename("file.json", "tmp.json")
+        except IOError:
+            pass
+
+    @classmethod
+    def tearDown(self):
+        for path in ("file.json", "file.json.log"):
+            try:
+                os.remove(path)
+            except IOError:
+                pass
+        try:
+            os.rename("tmp.json", "file.json")
+        except IOError:
+            pass
+        FileStorage().save()
+        FileStorage().reload()
+
+    def sample(self):
+        """Returns a place using every kind of attribute"""
+        place = Place()
+        place.name = "Chez Betty été"
+        place.number_rooms = 3
+        place.latitude = 37.77
+        place.price_by_night = "cheap"
+        place.amenity_ids = ["a", "b"]
+        place.owner = {"nested": [1, 2.5, None]}
+        place.max_guest = -(1 << 70)
+        return place
+
+    def test_round_trip_and_detection(self):
+        place = self.sample()
+        expected = place.to_dict()
+        for name in ("json", "marshal", "binary"):
+            FileStorage(serializer=name).save()
+            FileStorage._FileStorage__objects.pop("Place." + place.id)
+            FileStorage().reload()
+            self.assertEqual(expected,
+                             FileStorage().get(Place, place.id).to_dict())
+        with open("file.json", "rb") as f:
+            self.assertEqual(b"HBNB-B1", f.read(7))
+
+    def test_epoch_timestamps_round_trip(self):
+        place = self.sample()
+        storage = FileStorage(serializer="binary", epoch_timestamps=True)
+        storage.save()
+        storage.reload()
+        self.assertEqual(place.to_dict(),
+                         storage.get(Place, place.id).to_dict())
+
+    def test_encode_object(self):
+        place = self.sample()
+        place.max_guest = 4
+        place.price_by_night = 80
+        binary = SERIALIZERS["binary"]
+        for epoch in (False, True):
+            record = place.to_dict(epoch=epoch)
+            for serializer in SERIALIZERS.values():
+                self.assertEqual(record, serializer.decode(
+                    serializer.encode_object(place, epoch)))
+            self.assertEqual(
+                binary._BinarySerializer__encode(
+                    record, "Place", binary.schema("Place")),
+                binary.encode_object(place, epoch))
+
+    def test_binary_is_smaller(self):
+        for i in range(20):
+            self.sample()
+        sizes = {}
+        for name in ("json", "marshal", "binary"):
+            FileStorage(serializer=name).save()
+            sizes[name] = os.path.getsize("file.json")
+        self.assertLess(sizes["binary"], sizes["json"])
+
+    def test_compressed_binary(self):
+        place = self.sample()
+        storage = FileStorage(serializer="binary", compression="zlib")
+        storage.save()
+        storage.reload()
+        self.assertEqual(place.to_dict(),
+                         storage.get(Place, place.id).to_dict())
+
+    def test_journal_log_stays_json(self):
+        storage = FileStorage(serializer="marshal", journal=True)
+        storage.save()
+        place = self.sample()
+        storage.save()
+        with open("file.json.log", "r") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(place.to_dict(), lines[-1]["value"])
+        storage.reload()
+        self.assertEqual(place.to_dict(),
+                         storage.get(Place, place.id).to_dict())
+
+    def test_schema_written_with_the_file(self):
+        place = self.sample()
+        binary = SERIALIZERS["binary"]
+        schema = binary.schema
+
+        with patch.object(type(binary), "schema", autospec=True,
+                          side_effect=lambda self, name: schema(name)[::-1]):
+            FileStorage(serializer="binary").save()
+        storage = FileStorage(serializer="binary")
+        storage.reload()
+        self.assertEqual(place.to_dict(),
+                         storage.get(Place, place.id).to_dict())
+
+    def test_instances_with_other_serializers(self):
+        place = self.sample()
+        FileStorage(serializer="binary").save()
+        FileStorage().save()
+        with open("file.json", "r") as f:
+            self.assertEqual(place.name,
+                             json.load(f)["Place." + place.id]["name"])
+
+    def test_unknown_serializer(self):
+        with self.assertRaises(ValueError):
+            FileStorage(serializer="yaml")
+
+
 if __name__ == '__main__':
     unittest.main()
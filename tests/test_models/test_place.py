@@ -7,6 +7,8 @@ import pep8
 from datetime import datetime
 from models.place import Place
 from models.base_model import BaseModel
+from models.review import Review
+from models.amenity import Amenity
 
 
 class TestPlace(unittest.TestCase):
@@ -181,6 +183,25 @@ class TestPlace(unittest.TestCase):
         with self.assertRaises(TypeError):
             model.to_dict(None)
 
+    def test_reviews(self):
+        place = Place()
+        review = Review()
+        review.place_id = place.id
+        self.assertEqual([review], place.reviews)
+        Review().place_id = "elsewhere"
+        self.assertEqual([review], place.reviews)
+
+    def test_amenities(self):
+        place = Place()
+        wifi = Amenity()
+        pool = Amenity()
+        place.amenity_ids = [pool.id, "missing", wifi.id]
+        self.assertEqual([pool, wifi], place.amenities)
+        place.amenity_ids.remove(pool.id)
+        self.assertEqual([wifi], place.amenities)
+        models.storage.delete(wifi)
+        self.assertEqual([], place.amenities)
+
 
 if __name__ == '__main__':
     unittest.main()
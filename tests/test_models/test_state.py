@@ -7,6 +7,8 @@ import pep8
 from datetime import datetime
 from models.state import State
 from models.base_model import BaseModel
+from models.city import City
+from unittest.mock import patch
 
 
 class TestState(unittest.TestCase):
@@ -180,6 +182,25 @@ class TestState(unittest.TestCase):
         with self.assertRaises(TypeError):
             model.to_dict(None)
 
+    def test_cities(self):
+        state = State()
+        city = City()
+        city.state_id = state.id
+        other = City()
+        self.assertEqual([city], state.cities)
+        other.state_id = state.id
+        self.assertEqual([city, other], state.cities)
+        models.storage.delete(city)
+        self.assertEqual([other], state.cities)
+
+    def test_cities_are_memoized(self):
+        state = State()
+        City().state_id = state.id
+        cities = state.cities
+        with patch.object(models.storage, "find") as find:
+            self.assertEqual(cities, state.cities)
+            find.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -7,6 +7,7 @@ import pep8
 from datetime import datetime
 from models.user import User
 from models.base_model import BaseModel
+from models.place import Place
 
 
 class TestUser(unittest.TestCase):
@@ -181,6 +182,12 @@ class TestUser(unittest.TestCase):
         with self.assertRaises(TypeError):
             model.to_dict(None)
 
+    def test_places(self):
+        user = User()
+        place = Place()
+        place.user_id = user.id
+        self.assertEqual([place], user.places)
+
 
 if __name__ == '__main__':
     unittest.main()